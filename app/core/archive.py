@@ -0,0 +1,137 @@
+"""Arkivering af afviklede bookinger.
+
+Vi læser kun nutid og nær fremtid, men bookings vokser for evigt. Bookinger
+der startede før ARCHIVE_AFTER_DAYS dage siden flyttes derfor til
+bookings_archive i små batches (INSERT ... SELECT + DELETE i én kort
+transaktion pr. batch), så hverken opstart eller trafik venter på en lang
+lås. Første kørsel er samtidig backfill af eksisterende data.
+
+Månedlig partitionering er fravalgt: exclusion-constraint'en mod overlap
+(ex_booking_no_overlap) kan ikke ligge på en partitioneret tabel i
+Postgres 16, og partitionsnøglen skulle ind i primærnøglen.
+
+Jobbet kører som baggrundsopgave i hver worker hvert ARCHIVE_INTERVAL
+sekund; på Postgres sørger en advisory lock for at kun én worker flytter ad
+gangen. Kan også køres fra cron:
+
+    python -m app.core.archive [--days 90] [--batch 5000]
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete, insert, select, text
+from starlette.concurrency import run_in_threadpool
+
+from app.core.tz import now_utc
+from app.db import SessionLocal, get_engine
+from app.models import Booking, BookingArchive
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))   # 0 slår arkivering fra
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "3600"))
+ARCHIVE_BATCH = int(os.getenv("ARCHIVE_BATCH", "5000"))
+ARCHIVE_LOCK_KEY = 7_310_412
+
+_COLS = ("id", "resource_id", "start_utc", "end_utc", "name", "phone", "created_at")
+
+
+def archive_cutoff(days: Optional[int] = None) -> Optional[datetime]:
+    days = ARCHIVE_AFTER_DAYS if days is None else days
+    if days <= 0:
+        return None
+    return now_utc().replace(microsecond=0) - timedelta(days=days)
+
+
+def _move_batch(db, cutoff: datetime, batch: int) -> int:
+    ids = select(Booking.id).where(Booking.start_utc < cutoff).order_by(Booking.id).limit(batch)
+    if db.get_bind().dialect.name == "postgresql":
+        ids = ids.with_for_update(skip_locked=True)
+    ids = list(db.execute(ids).scalars())
+    if not ids:
+        return 0
+    src = select(*(getattr(Booking, c) for c in _COLS)).where(Booking.id.in_(ids))
+    db.execute(insert(BookingArchive).from_select(list(_COLS), src))
+    db.execute(delete(Booking).where(Booking.id.in_(ids)))
+    return len(ids)
+
+
+def archive_old_bookings(days: Optional[int] = None, batch: Optional[int] = None,
+                         max_batches: Optional[int] = None) -> Dict:
+    """Flyt gamle bookinger i batches; returnerer antal flyttet og tid."""
+    cutoff = archive_cutoff(days)
+    if cutoff is None:
+        return {"moved": 0, "batches": 0, "seconds": 0.0, "skipped": "disabled"}
+    batch = batch or ARCHIVE_BATCH
+    engine = get_engine()
+    moved = batches = 0
+    t0 = time.perf_counter()
+    while max_batches is None or batches < max_batches:
+        with SessionLocal() as db:
+            if engine.dialect.name == "postgresql":
+                got = db.execute(text("SELECT pg_try_advisory_xact_lock(:k)"), {"k": ARCHIVE_LOCK_KEY}).scalar()
+                if not got:
+                    return {"moved": moved, "batches": batches, "seconds": 0.0, "skipped": "locked"}
+            n = _move_batch(db, cutoff, batch)
+            db.commit()
+        if not n:
+            break
+        moved += n
+        batches += 1
+    return {"moved": moved, "batches": batches, "seconds": round(time.perf_counter() - t0, 3),
+            "cutoff": cutoff.isoformat()}
+
+
+class ArchiveJob:
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+        self.last: Optional[Dict] = None
+        self.runs = 0
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                self.last = await run_in_threadpool(archive_old_bookings)
+                self.runs += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last = {"error": str(getattr(e, "orig", e))}
+                print(f"[archive] Fejl: {self.last['error']}")
+            await asyncio.sleep(ARCHIVE_INTERVAL)
+
+    def start(self) -> None:
+        if ARCHIVE_AFTER_DAYS > 0 and ARCHIVE_INTERVAL > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    def stats(self) -> Dict:
+        return {"enabled": self._task is not None, "after_days": ARCHIVE_AFTER_DAYS,
+                "runs": self.runs, "last": self.last}
+
+
+job = ArchiveJob()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.models import init_db
+
+    ap = argparse.ArgumentParser(description="Flyt afviklede bookinger til bookings_archive")
+    ap.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS)
+    ap.add_argument("--batch", type=int, default=ARCHIVE_BATCH)
+    args = ap.parse_args()
+    init_db()
+    print(archive_old_bookings(args.days, args.batch))
@@ -0,0 +1,103 @@
+"""Async databasesti (valgfri) for læse-ruterne.
+
+Med DB_ASYNC=1 kører læse-ruterne på en AsyncEngine (psycopg async eller
+asyncpg) i stedet for at optage en tråd i Starlettes threadpool mens de
+venter på Postgres. Selve forespørgslerne er de samme synkrone ORM-funktioner
+som før – de køres via AsyncSession.run_sync(), så der kun findes én version
+af hver forespørgsel. Uden DB_ASYNC bruges den synkrone Session i threadpoolen
+som hidtil.
+
+run_sync() kører funktionen i event-loopets tråd; alt hvad den laver ud over
+at vente på databasen blokerer alle andre requests. Ruterne deler derfor
+arbejdet i to: fn(db, ...) henter kun rækkerne, shape(rækker) bygger svaret
+(slot-grids, JSON) – i async-tilstand i threadpoolen, efter at sessionen er
+lukket.
+
+DB_ASYNC er slået fra som standard og er ikke en generel speed-up: på en
+maskine hvor CPU'en er flaskehalsen (bench/bench_async.py på én delt kerne)
+er async-stien langsommere end threadpoolen. Den hjælper kun når requests
+mest venter på Postgres – mål på produktionsmaskinen før den slås til.
+
+Poolen styres af de samme miljøvariabler som den synkrone engine (app/db.py).
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.db import SessionLocal, database_url, get_engine, pool_kwargs
+
+
+def _bool(v: Optional[str]) -> bool:
+    return str(v or "").strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
+ASYNC_ENABLED = _bool(os.getenv("DB_ASYNC"))
+
+
+def async_url(url: str) -> str:
+    """Oversætter DB_URL til en async driver (psycopg3 er async-kompatibel som den er)."""
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgresql://") or url.startswith("postgres://"):
+        return "postgresql+psycopg://" + url.split("://", 1)[1]
+    return url
+
+
+_engine = None
+_sessionmaker = None
+
+
+def get_async_sessionmaker():
+    global _engine, _sessionmaker
+    if _sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        url = async_url(database_url())
+        _engine = create_async_engine(url, **pool_kwargs(url))
+        _sessionmaker = async_sessionmaker(_engine, autoflush=False, expire_on_commit=False)
+    return _sessionmaker
+
+
+async def dispose() -> None:
+    global _engine, _sessionmaker
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = _sessionmaker = None
+
+
+def pool_stats() -> dict:
+    if _engine is None:
+        return {"created": False}
+    pool = _engine.pool
+    return {
+        "created": True,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    } if hasattr(pool, "checkedout") else {"created": True, "pool": type(pool).__name__}
+
+
+def _run_sync(fn: Callable[..., Any], args: tuple, shape: Optional[Callable[[Any], Any]]) -> Any:
+    get_engine()
+    db = SessionLocal()
+    try:
+        out = fn(db, *args)
+    finally:
+        db.close()
+    return out if shape is None else shape(out)
+
+
+async def run_db(fn: Callable[..., Any], *args: Any, shape: Optional[Callable[[Any], Any]] = None) -> Any:
+    """shape(fn(db, *args)) med en Session – async eller i threadpoolen.
+
+    fn skal kun hente rækker; CPU-arbejdet hører til i shape, som aldrig kører
+    i event-loopet.
+    """
+    if ASYNC_ENABLED:
+        async with get_async_sessionmaker()() as session:
+            out = await session.run_sync(lambda db: fn(db, *args))
+        return out if shape is None else await run_in_threadpool(shape, out)
+    return await run_in_threadpool(_run_sync, fn, args, shape)
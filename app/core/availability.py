@@ -0,0 +1,142 @@
+"""Ledighedsberegning for borde.
+
+Rene funktioner over (start, slut)-intervaller, så samme logik kan bruges af
+både dags- og periode-endpoints uden at kende til SQLAlchemy. Input er rækker
+sorteret på (resource_id, start); alt beregnes i ét lineært sweep.
+
+Tiderne er aware UTC; `tz` bestemmer kun hvordan labels og ISO-strenge
+skrives ud. Slots regnes i absolut tid, så en nat med sommertidsskift har
+én slot mere eller mindre.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, tzinfo
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Samme granularitet som create_booking håndhæver (30 min staff, 60 min offentligt)
+SLOT_GRANULARITIES = (30, 60)
+
+Interval = Tuple[datetime, datetime]
+
+
+def merge_busy(rows: Iterable[Tuple[int, datetime, datetime]]) -> Dict[int, List[Interval]]:
+    """Slår overlappende/tilstødende bookinger sammen pr. bord.
+
+    `rows` skal være sorteret på (resource_id, start).
+    """
+    out: Dict[int, List[Interval]] = {}
+    for rid, s, e in rows:
+        lst = out.setdefault(rid, [])
+        if lst and s <= lst[-1][1]:
+            if e > lst[-1][1]:
+                lst[-1] = (lst[-1][0], e)
+        else:
+            lst.append((s, e))
+    return out
+
+
+def slot_grid(busy: List[Interval], open_dt: datetime, close_dt: datetime, step: int,
+              tz: Optional[tzinfo] = None) -> List[Dict]:
+    """Deler [open_dt, close_dt) op i slots á `step` minutter og markerer optaget tid.
+
+    `busy` er de sammenslåede, sorterede intervaller for ét bord.
+    """
+    delta = timedelta(minutes=step)
+    slots: List[Dict] = []
+    i, n = 0, len(busy)
+    cur = open_dt
+    while cur < close_dt:
+        end = min(cur + delta, close_dt)
+        while i < n and busy[i][1] <= cur:
+            i += 1
+        taken = 0
+        j = i
+        while j < n and busy[j][0] < end:
+            taken += int((min(busy[j][1], end) - max(busy[j][0], cur)).total_seconds() // 60)
+            j += 1
+        local = cur.astimezone(tz) if tz else cur
+        slots.append({
+            "label": local.strftime("%H:%M"),
+            "iso_start_local": local.isoformat(),
+            "free": taken == 0,
+            "busy_minutes": taken,
+        })
+        cur = end
+    return slots
+
+
+def busy_json(busy: List[Interval], tz: Optional[tzinfo] = None) -> List[Dict[str, str]]:
+    if tz:
+        return [{"start_local": s.astimezone(tz).isoformat(), "end_local": e.astimezone(tz).isoformat()}
+                for s, e in busy]
+    return [{"start_local": s.isoformat(), "end_local": e.isoformat()} for s, e in busy]
+
+
+def timeline(rows: Iterable[Tuple[int, int, datetime, datetime]], resource_ids: List[int],
+             open_dt: datetime, close_dt: datetime, now: datetime,
+             tz: Optional[tzinfo] = None) -> Dict[int, Dict]:
+    """Dagens tidslinje pr. bord i ét sweep over (id, resource_id, start, slut).
+
+    `rows` skal være sorteret på (resource_id, start). For hvert bord:
+    sammenslåede optagede intervaller (klippet til åbningsvinduet), ledige
+    huller imellem, udnyttelse i procent, den booking der slutter først
+    efter `now` og – hvis en booking går ud over lukketid – hvornår bordet
+    reelt er fri (overrun).
+    """
+    fmt = (lambda dt: dt.astimezone(tz).isoformat()) if tz else (lambda dt: dt.isoformat())
+    window = (close_dt - open_dt).total_seconds()
+    state = {rid: {"busy": [], "free": [], "cur": None, "free_from": open_dt, "next": None, "last_end": None}
+             for rid in resource_ids}
+
+    def close_interval(st: Dict) -> None:
+        s, e = st["cur"]
+        if s > st["free_from"]:
+            st["free"].append((st["free_from"], s))
+        st["busy"].append((s, e))
+        st["free_from"] = e
+
+    for bid, rid, s, e in rows:
+        st = state.get(rid)
+        if st is None:
+            continue
+        if st["last_end"] is None or e > st["last_end"]:
+            st["last_end"] = e
+        if e > now and (st["next"] is None or e < st["next"][1]):
+            st["next"] = (bid, e)
+        cs, ce = max(s, open_dt), min(e, close_dt)
+        if cs >= ce:
+            continue
+        if st["cur"] is not None and cs <= st["cur"][1]:
+            st["cur"] = (st["cur"][0], max(st["cur"][1], ce))
+        else:
+            if st["cur"] is not None:
+                close_interval(st)
+            st["cur"] = (cs, ce)
+
+    out: Dict[int, Dict] = {}
+    for rid, st in state.items():
+        if st["cur"] is not None:
+            close_interval(st)
+        if st["free_from"] < close_dt:
+            st["free"].append((st["free_from"], close_dt))
+        busy_s = sum((e - s).total_seconds() for s, e in st["busy"])
+        nxt = st["next"]
+        out[rid] = {
+            "busy": [{"start_local": fmt(s), "end_local": fmt(e)} for s, e in st["busy"]],
+            "free": [{"start_local": fmt(s), "end_local": fmt(e)} for s, e in st["free"]],
+            "busy_minutes": int(busy_s // 60),
+            "free_minutes": int((window - busy_s) // 60),
+            "utilization_pct": round(100 * busy_s / window, 1) if window else 0.0,
+            "next_end": None if nxt is None else {
+                "booking_id": nxt[0],
+                "end_local": fmt(nxt[1]),
+                "minutes_left": int((nxt[1] - now).total_seconds() // 60),
+            },
+            "overrun_until_local": fmt(st["last_end"]) if st["last_end"] and st["last_end"] > close_dt else None,
+        }
+    return out
+
+
+def occupancy_bits(slots: List[Dict]) -> str:
+    """Kompakt repræsentation af en slot-række: '0' = ledig, '1' = (delvist) optaget."""
+    return "".join("0" if s["free"] else "1" for s in slots)
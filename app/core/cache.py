@@ -0,0 +1,134 @@
+"""Versionsstyret svar-cache for læse-endpoints.
+
+Hver dato har en versionstæller, som bumpes af create/extend/delete. ETag'en
+bygges af versionen, så klienter kan få 304 uden at røre databasen, og
+serialiserede svar gemmes i en lille LRU med kort TTL nøglet på
+(endpoint, dato, staff, version, ...). En ny version giver en ny nøgle, så
+gamle poster aldrig rammes igen og blot skubbes ud af LRU'en.
+
+SingleFlight samler samtidige cache-miss på samme nøgle: den første request
+bygger svaret, de andre venter på den samme beregning i stedet for at køre
+hver sin forespørgsel.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, Optional, TypeVar
+
+
+class DateVersions:
+    def __init__(self) -> None:
+        # epoch skifter ved hver opstart, så ETags fra en tidligere proces ikke matcher
+        self.epoch = uuid.uuid4().hex[:8]
+        self._v: Dict[date, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, d: date) -> int:
+        return self._v.get(d, 0)
+
+    def bump(self, dates: Iterable[date]) -> None:
+        with self._lock:
+            for d in set(dates):
+                self._v[d] = self._v.get(d, 0) + 1
+
+    def reset(self) -> None:
+        # Alt kan være ændret (fx tabte NOTIFY-beskeder): ny epoch ugyldiggør
+        # alle udleverede ETags og cache-nøgler
+        with self._lock:
+            self.epoch = uuid.uuid4().hex[:8]
+            self._v.clear()
+
+
+class ResponseCache:
+    def __init__(self, maxsize: Optional[int] = None, ttl: Optional[float] = None) -> None:
+        self.maxsize = maxsize or int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("RESPONSE_CACHE_TTL", "10"))
+        self._data: "OrderedDict[Hashable, tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key: Hashable, body: bytes) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, body)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else None,
+            "not_modified": self.not_modified,
+        }
+
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Højst én igangværende beregning pr. nøgle (pr. event-loop/worker)."""
+
+    def __init__(self, enabled: Optional[bool] = None) -> None:
+        self.enabled = enabled if enabled is not None else os.getenv("SINGLE_FLIGHT", "1") != "0"
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        if not self.enabled:
+            return await fn()
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.shared += 1
+        # shield: afbryder én klient, fortsætter beregningen for de andre
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        # hentes, så en fejl ingen ventede på ikke logges som "never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict:
+        return {"enabled": self.enabled, "in_flight": len(self._inflight),
+                "leaders": self.leaders, "shared": self.shared}
+
+
+versions = DateVersions()
+response_cache = ResponseCache()
+single_flight = SingleFlight()
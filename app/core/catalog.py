@@ -0,0 +1,92 @@
+"""In-process katalog over borde (resources).
+
+Borde ændres næsten aldrig, men både den offentlige side og staff-siden
+henter dem ved hver sidevisning. Kataloget holder et snapshot i hukommelsen
+og et versionsnummer, som bumpes når en transaktion der har oprettet, ændret
+eller slettet en Resource via ORM'en committes. Næste læsning efter en bump
+henter snapshottet på ny.
+Andre workers invalideres via app/core/notify.py.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.notify import bus
+from app.models import Resource
+
+
+class ResourceCatalog:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._version = 0
+        self._loaded_version = -1
+        self._rows: List[Dict] = []
+        self._by_id: Dict[int, Dict] = {}
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+
+    def load(self, db: Session) -> None:
+        # Versionen læses FØR forespørgslen, så en invalidering der sker
+        # undervejs stadig tvinger en ny indlæsning næste gang.
+        version = self._version
+        rows = db.query(Resource).order_by(Resource.id.asc()).all()
+        items = [{"id": r.id, "name": r.name, "kind": getattr(r, "kind", None) or "pool"} for r in rows]
+        with self._lock:
+            self._rows = items
+            self._by_id = {it["id"]: it for it in items}
+            self._loaded_version = version
+
+    def _ensure(self, db: Session) -> None:
+        if self._loaded_version != self._version:
+            self.load(db)
+
+    def cached(self) -> Optional[List[Dict]]:
+        # snapshot uden databaseadgang – None hvis det skal genindlæses
+        return self._rows if self._loaded_version == self._version else None
+
+    def all(self, db: Session) -> List[Dict]:
+        self._ensure(db)
+        return self._rows
+
+    def get(self, db: Session, rid: int) -> Optional[Dict]:
+        self._ensure(db)
+        return self._by_id.get(rid)
+
+
+catalog = ResourceCatalog()
+
+
+def _on_resource_change(mapper, connection, target) -> None:
+    # mapper-events kommer ved flush, før commit: invalideres der her, kan en
+    # samtidig læsning nå at cache rækkerne fra før commit under den nye
+    # version. Sessionen mærkes, og der invalideres i after_commit.
+    sess = Session.object_session(target)
+    if sess is not None:
+        sess.info["catalog_dirty"] = True
+    # andre workers får besked når transaktionen committes
+    bus.notify_catalog(connection)
+
+
+for _evt in ("after_insert", "after_update", "after_delete"):
+    event.listen(Resource, _evt, _on_resource_change)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    if session.info.pop("catalog_dirty", False):
+        catalog.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop("catalog_dirty", None)
@@ -1,7 +1,15 @@
 import os
+import re
+import html
+import time
 import asyncio
+from collections import deque
+from email.message import EmailMessage
+from email.utils import formataddr
+
+import aiosmtplib
 from pydantic import BaseModel, EmailStr
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
+from fastapi_mail import ConnectionConfig
 
 class BookingEmailData(BaseModel):
     to: EmailStr
@@ -61,15 +69,35 @@ def _get_conf() -> ConnectionConfig | None:
     )
     return _CONF
 
-def _build_html(data: BookingEmailData) -> str:
-    phone_row = f"""
+class _Template:
+    """Skabelon der splittes én gang ved import i statiske dele og feltnavne.
+
+    Felter skrives som {{navn}}. render() fletter blot de færdige værdier ind
+    mellem de statiske stykker – escaping sker i _html_fields().
+    """
+    _FIELD = re.compile(r"\{\{(\w+)\}\}")
+
+    def __init__(self, source: str) -> None:
+        parts = self._FIELD.split(source)
+        self._head = parts[0]
+        self._pairs = tuple(zip(parts[1::2], parts[2::2]))
+
+    def render(self, values: dict) -> str:
+        out = [self._head]
+        for name, static in self._pairs:
+            out.append(values[name])
+            out.append(static)
+        return "".join(out)
+
+
+_PHONE_ROW = _Template("""
       <tr>
         <td style="padding: 10px 14px; color: #64748b; font-weight: 600; font-size: 14px; border-bottom: 1px solid #f1f5f9;">Telefon</td>
-        <td style="padding: 10px 14px; color: #0f172a; font-weight: 500; font-size: 14px; border-bottom: 1px solid #f1f5f9; text-align: right;">{data.phone}</td>
+        <td style="padding: 10px 14px; color: #0f172a; font-weight: 500; font-size: 14px; border-bottom: 1px solid #f1f5f9; text-align: right;">{{phone}}</td>
       </tr>
-    """ if data.phone else ""
+    """)
 
-    return f"""<!doctype html>
+_HTML = _Template("""<!doctype html>
 <html lang="da">
   <head>
     <meta charset="utf-8">
@@ -99,7 +127,7 @@ def _build_html(data: BookingEmailData) -> str:
             <tr>
               <td style="padding: 32px 28px;">
                 <h2 style="color: #0f172a; font-size: 18px; margin-top: 0; margin-bottom: 8px;">
-                  Tak for din booking, {data.name}!
+                  Tak for din booking, {{name}}!
                 </h2>
                 <p style="color: #475569; font-size: 15px; line-height: 1.6; margin-top: 0; margin-bottom: 24px;">
                   Vi har modtaget din reservation og glæder os til at tage imod dig hos Pool Hall Randers. Her er dine bookingoplysninger:
@@ -109,25 +137,25 @@ def _build_html(data: BookingEmailData) -> str:
                 <table role="presentation" width="100%" border="0" cellspacing="0" cellpadding="0" style="background-color: #f8fafc; border: 1px solid #e2e8f0; border-radius: 12px; border-collapse: separate; overflow: hidden; margin-bottom: 28px;">
                   <tr>
                     <td style="padding: 10px 14px; color: #64748b; font-weight: 600; font-size: 14px; border-bottom: 1px solid #f1f5f9;">Booking ID</td>
-                    <td style="padding: 10px 14px; color: #f97316; font-weight: 700; font-size: 14px; border-bottom: 1px solid #f1f5f9; text-align: right;">#{data.booking_id}</td>
+                    <td style="padding: 10px 14px; color: #f97316; font-weight: 700; font-size: 14px; border-bottom: 1px solid #f1f5f9; text-align: right;">#{{booking_id}}</td>
                   </tr>
                   <tr>
                     <td style="padding: 10px 14px; color: #64748b; font-weight: 600; font-size: 14px; border-bottom: 1px solid #f1f5f9;">Dato</td>
-                    <td style="padding: 10px 14px; color: #0f172a; font-weight: 600; font-size: 14px; border-bottom: 1px solid #f1f5f9; text-align: right;">{data.date}</td>
+                    <td style="padding: 10px 14px; color: #0f172a; font-weight: 600; font-size: 14px; border-bottom: 1px solid #f1f5f9; text-align: right;">{{date}}</td>
                   </tr>
                   <tr>
                     <td style="padding: 10px 14px; color: #64748b; font-weight: 600; font-size: 14px; border-bottom: 1px solid #f1f5f9;">Tidspunkt</td>
-                    <td style="padding: 10px 14px; color: #0f172a; font-weight: 600; font-size: 14px; border-bottom: 1px solid #f1f5f9; text-align: right;">{data.start} – {data.end}</td>
+                    <td style="padding: 10px 14px; color: #0f172a; font-weight: 600; font-size: 14px; border-bottom: 1px solid #f1f5f9; text-align: right;">{{start}} – {{end}}</td>
                   </tr>
                   <tr>
                     <td style="padding: 10px 14px; color: #64748b; font-weight: 600; font-size: 14px; border-bottom: 1px solid #f1f5f9;">Bord / Aktivitet</td>
-                    <td style="padding: 10px 14px; color: #0f172a; font-weight: 600; font-size: 14px; border-bottom: 1px solid #f1f5f9; text-align: right;">{data.table}</td>
+                    <td style="padding: 10px 14px; color: #0f172a; font-weight: 600; font-size: 14px; border-bottom: 1px solid #f1f5f9; text-align: right;">{{table}}</td>
                   </tr>
                   <tr>
                     <td style="padding: 10px 14px; color: #64748b; font-weight: 600; font-size: 14px; border-bottom: 1px solid #f1f5f9;">Antal personer</td>
-                    <td style="padding: 10px 14px; color: #0f172a; font-weight: 600; font-size: 14px; border-bottom: 1px solid #f1f5f9; text-align: right;">{data.people}</td>
+                    <td style="padding: 10px 14px; color: #0f172a; font-weight: 600; font-size: 14px; border-bottom: 1px solid #f1f5f9; text-align: right;">{{people}}</td>
                   </tr>
-                  {phone_row}
+                  {{phone_row}}
                 </table>
 
                 <!-- Facebook Contact Box -->
@@ -164,28 +192,278 @@ def _build_html(data: BookingEmailData) -> str:
       </tr>
     </table>
   </body>
-</html>"""
+</html>""")
+
+_TEXT = _Template("""Tak for din booking, {{name}}!
+
+Vi har modtaget din reservation og glæder os til at tage imod dig hos Pool Hall Randers.
+
+Booking ID:       #{{booking_id}}
+Dato:             {{date}}
+Tidspunkt:        {{start}} – {{end}}
+Bord / Aktivitet: {{table}}
+Antal personer:   {{people}}
+{{phone_line}}
+Spørgsmål eller ændringer? Kontakt os via Facebook:
+https://www.facebook.com/alpetoppenranders
+(Du kan ikke besvare denne e-mail.)
+
+Pool Hall Randers
+Din foretrukne bar til pool, shuffleboard & kolde øl.
+""")
+
+
+def _html_fields(data: BookingEmailData) -> dict:
+    esc = html.escape
+    return {
+        "name": esc(data.name),
+        "booking_id": esc(data.booking_id),
+        "date": esc(data.date),
+        "start": esc(data.start),
+        "end": esc(data.end),
+        "table": esc(data.table),
+        "people": str(int(data.people)),
+        "phone_row": _PHONE_ROW.render({"phone": esc(data.phone)}) if data.phone else "",
+    }
+
+def _build_html(data: BookingEmailData) -> str:
+    return _HTML.render(_html_fields(data))
+
+def _build_text(data: BookingEmailData) -> str:
+    return _TEXT.render({
+        "name": data.name,
+        "booking_id": data.booking_id,
+        "date": data.date,
+        "start": data.start,
+        "end": data.end,
+        "table": data.table,
+        "people": str(int(data.people)),
+        "phone_line": f"Telefon:          {data.phone}\n" if data.phone else "",
+    })
+
+def _subject(data: BookingEmailData) -> str:
+    return f"Bekræftelse – {data.date} {data.start}-{data.end} – {data.table}"
+
+def _build_message(data: BookingEmailData, conf: ConnectionConfig) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = formataddr((conf.MAIL_FROM_NAME or "", conf.MAIL_FROM))
+    msg["To"] = data.to
+    msg["Subject"] = _subject(data)
+    msg.set_content(_build_text(data))
+    msg.add_alternative(_build_html(data), subtype="html")
+    return msg
+
+def _smtp_client(conf: ConnectionConfig) -> aiosmtplib.SMTP:
+    return aiosmtplib.SMTP(
+        hostname=conf.MAIL_SERVER,
+        port=conf.MAIL_PORT,
+        username=conf.MAIL_USERNAME if conf.USE_CREDENTIALS else None,
+        password=conf.MAIL_PASSWORD.get_secret_value() if conf.USE_CREDENTIALS else None,
+        use_tls=conf.MAIL_SSL_TLS,
+        start_tls=conf.MAIL_STARTTLS,
+        validate_certs=conf.VALIDATE_CERTS,
+        timeout=conf.TIMEOUT,
+    )
 
 async def _send_async(data: BookingEmailData):
+    """Engangs-afsendelse (egen forbindelse) – bruges kun når dispatcheren ikke kører."""
     conf = _get_conf()
     if conf is None:
         return  # ikke konfigureret -> gør ingenting
-    fm = FastMail(conf)
-    subject = f"Bekræftelse – {data.date} {data.start}-{data.end} – {data.table}"
-    msg = MessageSchema(
-        subject=subject,
-        recipients=[data.to],
-        body=_build_html(data),
-        subtype="html",
-    )
-    await fm.send_message(msg)
+    smtp = _smtp_client(conf)
+    async with smtp:
+        await smtp.send_message(_build_message(data, conf))
     print(f"[mail] Sent booking confirmation to {data.to}")
 
-def send_booking_confirmation(data: BookingEmailData):
-    """Synkron wrapper (kan bruges i BackgroundTasks)."""
+
+class MailDispatcher:
+    """Langtlevende afsender med kø og genbrugt SMTP-forbindelse.
+
+    Startes i appens lifespan. Ruterne lægger mails i en begrænset kø (uden at
+    blokere), og én worker-task tømmer køen i batches over samme forbindelse.
+    Forbindelsen holdes åben mellem batches, tjekkes med NOOP efter pause og
+    lukkes efter MAIL_IDLE_CLOSE sekunder uden trafik. Fejlede afsendelser
+    forsøges igen med eksponentiel backoff.
+    """
+
+    def __init__(self) -> None:
+        self.maxsize = int(os.getenv("MAIL_QUEUE_SIZE", "500"))
+        self.batch_size = int(os.getenv("MAIL_BATCH", "20"))
+        self.retries = int(os.getenv("MAIL_RETRIES", "3"))
+        self.backoff = float(os.getenv("MAIL_BACKOFF", "0.5"))
+        self.keepalive = float(os.getenv("MAIL_KEEPALIVE", "30"))
+        self.idle_close = float(os.getenv("MAIL_IDLE_CLOSE", "120"))
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._smtp: aiosmtplib.SMTP | None = None
+        self._last_used = 0.0
+
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retried = 0
+        self.connects = 0
+        self._latencies: deque[float] = deque(maxlen=256)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._task = asyncio.create_task(self._run(), name="mail-dispatcher")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Forsøger at tømme køen inden for `timeout` og lukker forbindelsen."""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"[mail] Stopper med {self._queue.qsize()} mails i kø")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self._close()
+
+    def submit(self, data: BookingEmailData) -> bool:
+        """Trådsikker: kan kaldes fra synkrone ruter i threadpoolen."""
+        if not self.running:
+            return False
+        item = (data, time.perf_counter())
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._put(item)
+        else:
+            self._loop.call_soon_threadsafe(self._put, item)
+        return True
+
+    def _put(self, item) -> None:
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            print(f"[mail] Kø fuld – dropper bekræftelse til {item[0].to}")
+
+    def stats(self) -> dict:
+        lat = sorted(self._latencies)
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_max": self.maxsize,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "retried": self.retried,
+            "connects": self.connects,
+            "latency_ms_p50": round(lat[len(lat) // 2], 1) if lat else None,
+            "latency_ms_max": round(lat[-1], 1) if lat else None,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                item = await asyncio.wait_for(self._queue.get(), self.idle_close)
+            except asyncio.TimeoutError:
+                await self._close()
+                continue
+            batch = [item]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._send_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _send_batch(self, batch) -> None:
+        # fejl her må ikke slippe ud af _run – så dør dispatcheren og al mail
+        # stopper stille resten af processens levetid
+        try:
+            conf = _get_conf()
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"[mail] SMTP-konfiguration fejlede, dropper {len(batch)} mail(s): {e}")
+            return
+        if conf is None:
+            return
+        for data, queued_at in batch:
+            try:
+                msg = _build_message(data, conf)
+            except Exception as e:
+                self.failed += 1
+                print(f"[mail] Kunne ikke bygge mail til {getattr(data, 'to', '?')}, dropper den: {e}")
+                continue
+            for attempt in range(self.retries + 1):
+                try:
+                    smtp = await self._connection(conf)
+                    await smtp.send_message(msg)
+                    self._last_used = time.monotonic()
+                    self.sent += 1
+                    self._latencies.append((time.perf_counter() - queued_at) * 1000)
+                    break
+                except Exception as e:
+                    await self._close()
+                    if attempt >= self.retries:
+                        self.failed += 1
+                        print(f"[mail] Opgiver mail til {data.to}: {e}")
+                        break
+                    self.retried += 1
+                    await asyncio.sleep(self.backoff * (2 ** attempt))
+
+    async def _connection(self, conf: ConnectionConfig) -> aiosmtplib.SMTP:
+        smtp = self._smtp
+        if smtp is not None and smtp.is_connected:
+            if time.monotonic() - self._last_used < self.keepalive:
+                return smtp
+            try:
+                await smtp.noop()
+                return smtp
+            except Exception:
+                await self._close()
+        smtp = _smtp_client(conf)
+        await smtp.connect()
+        self.connects += 1
+        self._smtp = smtp
+        self._last_used = time.monotonic()
+        return smtp
+
+    async def _close(self) -> None:
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except Exception:
+            smtp.close()
+
+
+dispatcher = MailDispatcher()
+
+
+def send_booking_confirmation(data: BookingEmailData) -> bool:
+    """Lægger mailen i dispatcherens kø. Returnerer True hvis den blev sat i kø.
+
+    Kører dispatcheren ikke (fx i scripts), sendes der synkront som før.
+    """
+    if dispatcher.submit(data):
+        return True
     try:
         asyncio.run(_send_async(data))
     except RuntimeError:
         # Hvis der mod forventning er en event loop i gang:
         loop = asyncio.get_event_loop()
         loop.create_task(_send_async(data))
+    return False
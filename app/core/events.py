@@ -0,0 +1,68 @@
+"""In-process pub/sub for booking-ændringer.
+
+Mutations-ruterne publicerer små deltas (booking.created, booking.extended,
+booking.deleted), og /api/stream sender dem videre som Server-Sent Events til
+tilsluttede staff-klienter. Ruterne kører i Starlettes threadpool, så
+publish() er trådsikker og afleverer til event-loopet via call_soon_threadsafe.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import threading
+from typing import Dict, Optional, Set
+
+
+class EventHub:
+    def __init__(self, queue_size: int = 100) -> None:
+        self.queue_size = queue_size
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subs: Set[asyncio.Queue] = set()
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subs)
+
+    def subscribe(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subs.add(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        self._subs.discard(q)
+
+    def publish(self, type_: str, payload: Dict) -> None:
+        if self._loop is None or not self._subs:
+            return
+        with self._lock:
+            seq = next(self._seq)
+        event = {"seq": seq, "type": type_, **payload}
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._fanout(event)
+        else:
+            try:
+                self._loop.call_soon_threadsafe(self._fanout, event)
+            except RuntimeError:
+                pass  # loopet er lukket (shutdown)
+
+    def _fanout(self, event: Dict) -> None:
+        for q in list(self._subs):
+            try:
+                q.put_nowait(event)
+            except asyncio.QueueFull:
+                # Klienten hænger – smid backloggen og bed den hente alt igen
+                while not q.empty():
+                    q.get_nowait()
+                q.put_nowait({"seq": event["seq"], "type": "resync"})
+
+
+hub = EventHub()
@@ -0,0 +1,116 @@
+"""Eksport af bookinger som NDJSON eller CSV (GET /api/bookings/export).
+
+Svaret streames: rækkerne hentes med yield_per (server-side cursor på
+Postgres) fra både bookings og bookings_archive, flettes i starttid med
+heapq.merge – hver tabel læses i indeksrækkefølge, så databasen skal ikke
+sortere – og skrives ud EXPORT_YIELD_PER ad gangen. Hukommelsen er den
+samme for en dag og for fem år.
+
+Med gzip=True komprimeres strømmen undervejs (zlib med gzip-header); det
+er endpointet der afgør det ud fra Accept-Encoding.
+
+Generatoren har sin egen Session, fordi StreamingResponse først begynder at
+læse efter at endpointet (og dermed get_db) er færdigt.
+"""
+from __future__ import annotations
+
+import csv
+import heapq
+import io
+import json
+import os
+import zlib
+from datetime import datetime
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import select
+
+from app.core.tz import local_iso
+from app.db import SessionLocal
+from app.models import Booking, BookingArchive
+
+try:
+    import orjson
+except ImportError:  # valgfri – falder tilbage til stdlib json, som i app/main.py
+    orjson = None
+
+EXPORT_YIELD_PER = int(os.getenv("EXPORT_YIELD_PER", "2000"))
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+FIELDS = ("id", "date", "resource_id", "resource", "kind", "start_local", "end_local",
+          "minutes", "name", "phone", "archived")
+
+
+def _select(T, start: datetime, end: datetime, resource_ids: Optional[List[int]]):
+    q = (select(T.start_utc, T.end_utc, T.id, T.resource_id, T.name, T.phone)
+         .where(T.start_utc >= start, T.start_utc < end))
+    if resource_ids is not None:
+        q = q.where(T.resource_id.in_(resource_ids))
+    return q.order_by(T.start_utc.asc(), T.id.asc()).execution_options(yield_per=EXPORT_YIELD_PER)
+
+
+def _records(db, start: datetime, end: datetime, resource_ids: Optional[List[int]],
+             resources: Dict[int, Dict]) -> Iterator[List[Dict]]:
+    live = ((*r, False) for r in db.execute(_select(Booking, start, end, resource_ids)))
+    old = ((*r, True) for r in db.execute(_select(BookingArchive, start, end, resource_ids)))
+    batch: List[Dict] = []
+    for s, e, bid, rid, name, phone, archived in heapq.merge(old, live, key=itemgetter(0)):
+        res = resources.get(rid) or {}
+        start_local = local_iso(s)
+        batch.append({
+            "id": bid, "date": start_local[:10], "resource_id": rid,
+            "resource": res.get("name"), "kind": res.get("kind"),
+            "start_local": start_local, "end_local": local_iso(e),
+            "minutes": int((e - s).total_seconds() // 60), "name": name, "phone": phone,
+            "archived": archived,
+        })
+        if len(batch) >= EXPORT_YIELD_PER:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _line(r: Dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(r) + b"\n"
+    return json.dumps(r, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def _ndjson(batches: Iterable[List[Dict]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield b"".join(_line(r) for r in batch)
+
+
+def _csv(batches: Iterable[List[Dict]]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    w = csv.DictWriter(buf, fieldnames=FIELDS, lineterminator="\r\n")
+    w.writeheader()
+    # BOM, så Excel læser æøå i navnene som UTF-8
+    yield "\ufeff".encode("utf-8") + buf.getvalue().encode("utf-8")
+    for batch in batches:
+        buf.seek(0)
+        buf.truncate()
+        w.writerows(batch)
+        yield buf.getvalue().encode("utf-8")
+
+
+def _gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)   # wbits 31 = gzip-format
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+
+def stream(start: datetime, end: datetime, fmt: str, resources: Dict[int, Dict],
+           resource_ids: Optional[List[int]] = None, gzip: bool = False) -> Iterator[bytes]:
+    """Bookinger med start i [start, end) som bytes i det valgte format."""
+    db = SessionLocal()
+    try:
+        batches = _records(db, start, end, resource_ids, resources)
+        chunks = _csv(batches) if fmt == "csv" else _ndjson(batches)
+        yield from _gzip(chunks) if gzip else chunks
+    finally:
+        db.close()
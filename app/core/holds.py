@@ -0,0 +1,170 @@
+"""Hold-and-confirm: et kort hold på et tidsrum før bookingen gemmes.
+
+Den offentlige side sætter et hold (POST /api/holds) når gæsten begynder at
+udfylde sine oplysninger og bekræfter det (POST /api/holds/{id}/confirm)
+når formularen sendes. Holdet lever HOLD_TTL_SECONDS og tæller som optaget
+i availability, auto-tildeling og for andre bookinger; kun den der kender
+id'et kan bekræfte eller frigive det.
+
+Holdene ligger i slot_holds og ikke i hukommelsen, fordi alle workers skal
+se de samme. Opslag filtrerer på expires_at, så et udløbet hold er ledigt
+med det samme; HoldSweeper sletter dem hvert HOLD_SWEEP_INTERVAL sekund og
+melder datoerne tilbage, så cachede availability-svar også bliver frisket op.
+
+På Postgres tager hold, bekræftelser og bookinger pg_advisory_xact_lock på
+bordet før de ser efter hold, så to requests ikke når at tage samme tid.
+ex_booking_no_overlap gælder stadig kun bookings.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import secrets
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.tz import now_utc
+from app.db import SessionLocal
+from app.models import Booking, SlotHold
+
+HOLD_TTL_SECONDS = float(os.getenv("HOLD_TTL_SECONDS", "180"))
+HOLD_SWEEP_INTERVAL = float(os.getenv("HOLD_SWEEP_INTERVAL", "5"))   # 0 slår oprydningen fra
+HOLD_LOCK_KEY = 7_310_413
+
+Span = Tuple[datetime, datetime]
+
+
+class HoldStore:
+    def __init__(self) -> None:
+        self.placed = 0
+        self.conflicts = 0
+        self.confirmed = 0
+        self.released = 0
+        self.expired = 0
+
+    @staticmethod
+    def lock(db: Session, resource_id: int) -> None:
+        # frigives ved commit/rollback
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(select(func.pg_advisory_xact_lock(HOLD_LOCK_KEY, resource_id)))
+
+    @staticmethod
+    def live(db: Session, start: datetime, end: datetime,
+             resource_ids: Optional[List[int]] = None) -> List[Tuple[int, datetime, datetime]]:
+        """Levende hold der overlapper [start, end) som (resource_id, start, slut)."""
+        q = select(SlotHold.resource_id, SlotHold.start_utc, SlotHold.end_utc).where(
+            SlotHold.start_utc < end, SlotHold.end_utc > start, SlotHold.expires_at > now_utc())
+        if resource_ids is not None:
+            q = q.where(SlotHold.resource_id.in_(resource_ids))
+        return [tuple(r) for r in db.execute(q)]
+
+    def blocked(self, db: Session, resource_id: int, s: datetime, e: datetime,
+                exclude: Optional[str] = None) -> bool:
+        """Lås bordet og se om en andens hold overlapper [s, e)."""
+        self.lock(db, resource_id)
+        q = select(SlotHold.id).where(
+            SlotHold.resource_id == resource_id, SlotHold.start_utc < e, SlotHold.end_utc > s,
+            SlotHold.expires_at > now_utc())
+        if exclude is not None:
+            q = q.where(SlotHold.id != exclude)
+        return db.execute(q.limit(1)).first() is not None
+
+    def place(self, db: Session, resource_id: int, s: datetime, e: datetime) -> Optional[SlotHold]:
+        """Hold [s, e) på bordet og commit; None hvis det er booket eller holdt."""
+        if self.blocked(db, resource_id, s, e) or db.execute(
+            select(Booking.id).where(Booking.resource_id == resource_id,
+                                     Booking.start_utc < e, Booking.end_utc > s).limit(1)
+        ).first() is not None:
+            db.rollback()
+            self.conflicts += 1
+            return None
+        now = now_utc().replace(microsecond=0)
+        h = SlotHold(id=secrets.token_urlsafe(16), resource_id=resource_id, start_utc=s, end_utc=e,
+                     expires_at=now + timedelta(seconds=HOLD_TTL_SECONDS), created_at=now)
+        db.add(h)
+        db.commit()
+        self.placed += 1
+        return h
+
+    def take(self, db: Session, hold_id: str) -> SlotHold:
+        """Holdet der skal bekræftes, med bordet låst; 404/410 hvis det ikke findes."""
+        h = db.get(SlotHold, hold_id)
+        if h is not None:
+            self.lock(db, h.resource_id)
+            # en samtidig bekræftelse kan være nået først mens vi ventede på låsen
+            h = db.get(SlotHold, hold_id, populate_existing=True)
+        if h is None:
+            raise HTTPException(404, "Holdet findes ikke (allerede bekræftet eller frigivet)")
+        if h.expires_at <= now_utc():
+            db.delete(h)
+            db.commit()
+            raise HTTPException(410, "Holdet er udløbet – vælg tiden igen")
+        return h
+
+    def release(self, db: Session, hold_id: str) -> Optional[Span]:
+        h = db.get(SlotHold, hold_id)
+        if h is None:
+            return None
+        span = (h.start_utc, h.end_utc)
+        db.delete(h)
+        db.commit()
+        self.released += 1
+        return span
+
+    def sweep(self) -> List[Span]:
+        """Slet udløbne hold; returnerer deres tidsrum."""
+        with SessionLocal() as db:
+            rows = db.execute(delete(SlotHold).where(SlotHold.expires_at <= now_utc())
+                              .returning(SlotHold.start_utc, SlotHold.end_utc)).all()
+            db.commit()
+        self.expired += len(rows)
+        return [(s, e) for s, e in rows]
+
+    def stats(self) -> Dict:
+        return {"ttl_seconds": HOLD_TTL_SECONDS, "placed": self.placed, "conflicts": self.conflicts,
+                "confirmed": self.confirmed, "released": self.released, "expired": self.expired}
+
+
+holds = HoldStore()
+
+
+class HoldSweeper:
+    def __init__(self, store: HoldStore = holds) -> None:
+        self.store = store
+        self._task: Optional[asyncio.Task] = None
+        self._on_expired: Optional[Callable[[List[Span]], None]] = None
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                spans = await run_in_threadpool(self.store.sweep)
+                if spans and self._on_expired is not None:
+                    await run_in_threadpool(self._on_expired, spans)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[holds] Fejl: {getattr(e, 'orig', e)}")
+            await asyncio.sleep(HOLD_SWEEP_INTERVAL)
+
+    def start(self, on_expired: Callable[[List[Span]], None]) -> None:
+        """on_expired(tidsrum) kaldes i threadpoolen når hold er slettet."""
+        self._on_expired = on_expired
+        if HOLD_SWEEP_INTERVAL > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+
+sweeper = HoldSweeper()
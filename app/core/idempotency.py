@@ -0,0 +1,157 @@
+"""Idempotency-Key for skrivende booking-endpoints.
+
+Klienten sender en unik nøgle pr. handling (fx en UUID pr. udfyldt
+formular) og genbruger den når den prøver igen efter en netværksfejl. Første
+request med nøglen "claimer" den (række med status_code NULL, egen commit),
+udfører handlingen og gemmer svaret. Gentagelser får det gemte svar tilbage
+med Idempotent-Replayed: true – ingen overlap-tjek, ingen ny booking, ingen
+ny mail. Genkendelsen er ét primærnøgle-opslag.
+
+    samme nøgle, andet indhold        -> 422
+    samme nøgle, første kører stadig  -> 409 (Retry-After: 1)
+    endelig 4xx (400/403/404/410/422) -> gemmes og afspilles som alt andet
+    409/429/5xx/uventet fejl          -> nøglen frigives, så et nyt forsøg kører
+
+409 og 429 er forbigående (tiden er holdt, et kapløb om bordet, for mange
+requests) – et nyt forsøg med samme nøgle skal prøve igen, ikke få det gamle
+svar. En claim uden svar ældre end IDEMPOTENCY_CLAIM_TIMEOUT sekunder regnes
+for forladt (workeren døde undervejs) og overtages af næste forsøg.
+
+Nøgler udløber efter IDEMPOTENCY_TTL_HOURS; udløbne rækker ryddes op i
+forbifarten højst én gang pr. IDEMPOTENCY_PURGE_INTERVAL sekund pr. worker.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from datetime import timedelta
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.tz import now_utc
+from app.models import IdempotencyKey
+
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "3600"))
+IDEMPOTENCY_CLAIM_TIMEOUT = float(os.getenv("IDEMPOTENCY_CLAIM_TIMEOUT", "30"))
+FINAL_STATUSES = frozenset({400, 403, 404, 410, 422})
+MAX_KEY_LEN = 255
+
+
+class IdempotencyStore:
+    def __init__(self) -> None:
+        self._last_purge = 0.0
+        self.claimed = 0
+        self.replayed = 0
+        self.in_progress = 0
+        self.mismatched = 0
+        self.abandoned = 0
+        self.purged = 0
+
+    @staticmethod
+    def fingerprint(op: str, payload: BaseModel) -> str:
+        # op (fx "POST /api/bookings") med, så samme nøgle ikke kan bruges på to endpoints
+        return hashlib.sha256(f"{op}\n{payload.model_dump_json()}".encode("utf-8")).hexdigest()
+
+    def begin(self, db: Session, key: str, fp: str) -> Optional[Response]:
+        """Claim nøglen (None) eller returnér svaret til en gentagelse."""
+        if not 0 < len(key) <= MAX_KEY_LEN:
+            raise HTTPException(400, f"Idempotency-Key skal være 1-{MAX_KEY_LEN} tegn")
+        now = now_utc()
+        expires = now - timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+        abandoned = now - timedelta(seconds=IDEMPOTENCY_CLAIM_TIMEOUT)
+        for _ in range(2):
+            row = db.get(IdempotencyKey, key)
+            if row is not None and (row.created_at < expires
+                                    or (row.status_code is None and row.created_at < abandoned)):
+                if row.status_code is None:
+                    self.abandoned += 1
+                # kun den række vi så – en samtidig overtagelse må ikke slettes
+                db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key,
+                                                        IdempotencyKey.created_at == row.created_at))
+                db.commit()
+                row = None
+            if row is not None:
+                return self._replay(row, fp)
+            db.add(IdempotencyKey(key=key, fingerprint=fp, created_at=now_utc()))
+            try:
+                db.commit()
+            except IntegrityError:
+                # en samtidig request med samme nøgle nåede det først
+                db.rollback()
+                continue
+            self.claimed += 1
+            self._maybe_purge(db)
+            return None
+        raise HTTPException(409, "Request med samme Idempotency-Key er i gang")
+
+    def _replay(self, row: IdempotencyKey, fp: str) -> Response:
+        if row.fingerprint != fp:
+            self.mismatched += 1
+            return JSONResponse({"detail": "Idempotency-Key er allerede brugt til en anden forespørgsel"},
+                                status_code=422)
+        if row.status_code is None:
+            self.in_progress += 1
+            return JSONResponse({"detail": "Request med samme Idempotency-Key er i gang"},
+                                status_code=409, headers={"Retry-After": "1"})
+        self.replayed += 1
+        return Response(content=row.body, status_code=row.status_code, media_type="application/json",
+                        headers={"Idempotent-Replayed": "true"})
+
+    def finish(self, db: Session, key: str, status_code: int, body: bytes) -> None:
+        db.rollback()
+        db.execute(update(IdempotencyKey).where(IdempotencyKey.key == key)
+                   .values(status_code=status_code, body=body.decode("utf-8")))
+        db.commit()
+
+    def release(self, db: Session, key: str) -> None:
+        db.rollback()
+        db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+        db.commit()
+
+    def run(self, db: Session, key: Optional[str], op: str, payload: BaseModel, status_code: int,
+            fn: Callable[[], BaseModel], dumps: Callable[[object], bytes]):
+        """Kør fn() idempotent under key; uden key blot fn()."""
+        if not key:
+            return fn()
+        replay = self.begin(db, key, self.fingerprint(op, payload))
+        if replay is not None:
+            return replay
+        try:
+            out = fn()
+        except HTTPException as e:
+            if e.status_code in FINAL_STATUSES:
+                self.finish(db, key, e.status_code, dumps({"detail": e.detail}))
+            else:
+                self.release(db, key)
+            raise
+        except Exception:
+            self.release(db, key)
+            raise
+        self.finish(db, key, status_code, dumps(out.model_dump()))
+        return out
+
+    def _maybe_purge(self, db: Session) -> None:
+        now = time.monotonic()
+        if now - self._last_purge < IDEMPOTENCY_PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        expires = now_utc() - timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+        # ix_idempotency_created
+        n = db.execute(delete(IdempotencyKey).where(IdempotencyKey.created_at < expires)).rowcount
+        db.commit()
+        self.purged += n or 0
+
+    def stats(self) -> Dict:
+        return {"ttl_hours": IDEMPOTENCY_TTL_HOURS, "claimed": self.claimed, "replayed": self.replayed,
+                "in_progress": self.in_progress, "mismatched": self.mismatched, "abandoned": self.abandoned, "purged": self.purged}
+
+
+idempotency = IdempotencyStore()
@@ -0,0 +1,209 @@
+"""Prometheus-agtige metrikker uden ekstra afhængigheder.
+
+MetricsMiddleware (ren ASGI) måler latens og statuskoder pr. route-skabelon og
+tæller requests i gang. DB-forespørgsler tælles via SQLAlchemy's
+cursor-events på Engine-klassen – så både den synkrone og den asynkrone
+engine er med – og henføres til den request der kører (contextvar; Starlette
+kopierer konteksten ind i threadpoolen). /api/metrics skriver det hele ud i
+Prometheus' tekstformat.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _fmt_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect_left(self.buckets, v)] += 1
+        self.sum += v
+
+    def lines(self, name: str, labels: Labels) -> List[str]:
+        out, acc = [], 0
+        for b, c in zip(self.buckets, self.counts):
+            acc += c
+            out.append(f"{name}_bucket{_fmt_labels(labels, ('le', repr(float(b))))} {acc}")
+        acc += self.counts[-1]
+        out.append(f"{name}_bucket{_fmt_labels(labels, ('le', '+Inf'))} {acc}")
+        out.append(f"{name}_sum{_fmt_labels(labels)} {self.sum:.6f}")
+        out.append(f"{name}_count{_fmt_labels(labels)} {acc}")
+        return out
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests: Dict[Labels, int] = {}
+        self.latency: Dict[Labels, Histogram] = {}
+        self.db_queries: Dict[Labels, Histogram] = {}
+        self.db_seconds: Dict[Labels, Histogram] = {}
+        self.db_total = 0
+        self.db_total_seconds = 0.0
+        self.conflicts: Dict[Labels, int] = {}
+        # ekstra gauges/tællere der læses ved scrape (mail, cache, pool ...)
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, Labels, float]]]] = []
+
+    # --- registrering ---
+    def observe_request(self, method: str, route: str, status: int, seconds: float,
+                        queries: int, db_seconds: float) -> None:
+        rl: Labels = (("method", method), ("route", route))
+        with self._lock:
+            key = rl + (("status", str(status)),)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault(rl, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.db_queries.setdefault(rl, Histogram(QUERY_BUCKETS)).observe(queries)
+            self.db_seconds.setdefault(rl, Histogram(LATENCY_BUCKETS)).observe(db_seconds)
+
+    def observe_query(self, seconds: float) -> None:
+        with self._lock:
+            self.db_total += 1
+            self.db_total_seconds += seconds
+
+    def conflict(self, op: str, source: str) -> None:
+        # source: "precheck" (vores egen overlap-forespørgsel), "constraint" (DB)
+        # eller "exhausted" (auto-tildeling fandt intet ledigt bord)
+        key: Labels = (("op", op), ("source", source))
+        with self._lock:
+            self.conflicts[key] = self.conflicts.get(key, 0) + 1
+
+    def add_collector(self, fn: Callable[[], Iterable[Tuple[str, str, Labels, float]]]) -> None:
+        """fn() giver (navn, type, labels, værdi) og kaldes ved hver scrape."""
+        self._collectors.append(fn)
+
+    # --- eksport ---
+    def render(self) -> str:
+        out: List[str] = []
+
+        def header(name: str, typ: str, help_: str) -> None:
+            out.append(f"# HELP {name} {help_}")
+            out.append(f"# TYPE {name} {typ}")
+
+        with self._lock:
+            header("http_requests_in_flight", "gauge", "Requests der behandles lige nu")
+            out.append(f"http_requests_in_flight {self.in_flight}")
+            header("http_requests_total", "counter", "Requests pr. route og status")
+            for k, v in sorted(self.requests.items()):
+                out.append(f"http_requests_total{_fmt_labels(k)} {v}")
+            header("http_request_duration_seconds", "histogram", "Latens pr. route")
+            for k, h in sorted(self.latency.items()):
+                out.extend(h.lines("http_request_duration_seconds", k))
+            header("db_queries_per_request", "histogram", "DB-forespørgsler pr. request")
+            for k, h in sorted(self.db_queries.items()):
+                out.extend(h.lines("db_queries_per_request", k))
+            header("db_seconds_per_request", "histogram", "Tid i DB pr. request")
+            for k, h in sorted(self.db_seconds.items()):
+                out.extend(h.lines("db_seconds_per_request", k))
+            header("db_queries_total", "counter", "Alle DB-forespørgsler")
+            out.append(f"db_queries_total {self.db_total}")
+            header("db_query_seconds_total", "counter", "Samlet tid i DB-forespørgsler")
+            out.append(f"db_query_seconds_total {self.db_total_seconds:.6f}")
+            header("booking_conflicts_total", "counter", "409 pga. overlap")
+            for k, v in sorted(self.conflicts.items()):
+                out.append(f"booking_conflicts_total{_fmt_labels(k)} {v}")
+
+        seen = set()
+        for fn in self._collectors:
+            try:
+                samples = list(fn())
+            except Exception:
+                continue
+            for name, typ, labels, value in samples:
+                if name not in seen:
+                    out.append(f"# TYPE {name} {typ}")
+                    seen.add(name)
+                out.append(f"{name}{_fmt_labels(labels)} {value}")
+        return "\n".join(out) + "\n"
+
+
+metrics = Metrics()
+
+# [antal forespørgsler, sekunder] for den request der kører – None udenfor requests
+_db_usage: ContextVar[Optional[List]] = ContextVar("db_usage", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_q_t0", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("_q_t0")
+    if not stack:
+        return
+    dt = time.perf_counter() - stack.pop()
+    metrics.observe_query(dt)
+    usage = _db_usage.get()
+    if usage is not None:
+        usage[0] += 1
+        usage[1] += dt
+
+
+class MetricsMiddleware:
+    """Ren ASGI-middleware (ingen BaseHTTPMiddleware-overhead)."""
+
+    def __init__(self, app, skip: Iterable[str] = ()) -> None:
+        self.app = app
+        self.skip = set(skip)
+        self._routes: Optional[Dict] = None
+
+    def _route_path(self, scope) -> str:
+        # Route-skabelonen ("/api/bookings/{booking_id}") i stedet for den
+        # konkrete sti, så labels ikke eksploderer. Routeren lægger endpoint i scope.
+        if self._routes is None:
+            app = scope.get("app")
+            self._routes = {
+                getattr(r, "endpoint", None): r.path for r in getattr(app, "routes", ())
+            }
+        return self._routes.get(scope.get("endpoint"), "other")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip:
+            return await self.app(scope, receive, send)
+
+        status_holder = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder[0] = message["status"]
+            await send(message)
+
+        usage = [0, 0.0]
+        token = _db_usage.set(usage)
+        with metrics._lock:
+            metrics.in_flight += 1
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            dt = time.perf_counter() - t0
+            with metrics._lock:
+                metrics.in_flight -= 1
+            _db_usage.reset(token)
+            metrics.observe_request(
+                scope["method"], self._route_path(scope), status_holder[0], dt, usage[0], usage[1]
+            )
@@ -0,0 +1,141 @@
+"""Invalidering på tværs af workers via Postgres LISTEN/NOTIFY.
+
+Med flere uvicorn-workers har hver proces sine egne datoversioner,
+svar-cache, bordkatalog og SSE-hub. Mutations-ruterne sender derfor en lille
+besked på kanalen CHANNEL efter commit: hvilke datoer der er ændret og det
+SSE-event de selv har publiceret lokalt. Hver worker lytter på kanalen i en
+baggrundsopgave og gør det samme hos sig – bump datoerne, send eventet til
+sine egne SSE-klienter. Bordændringer sendes fra mapper-eventet i samme
+transaktion, så de først når de andre når data er committet.
+
+Mister lytteren forbindelsen, kan beskeder være gået tabt; ved genforbindelse
+smides alle versioner og cachede svar derfor væk, og SSE-klienterne bedes
+hente alt igen. Slås fra med DB_NOTIFY=0 (og er altid fra på SQLite).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import uuid
+from datetime import date
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func, select
+
+from app.core.cache import response_cache, versions
+from app.core.events import hub
+
+CHANNEL = "booking_changes"
+RECONNECT_SECONDS = 2.0
+
+
+class ChangeBus:
+    def __init__(self) -> None:
+        self.origin = uuid.uuid4().hex[:12]
+        self.enabled = os.getenv("DB_NOTIFY", "1").strip().lower() not in {"0", "false", "no", "off"}
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.received = 0
+        self.reconnects = 0
+
+    def _active(self, dialect_name: str) -> bool:
+        return self.enabled and dialect_name == "postgresql"
+
+    def _payload(self, **kw) -> str:
+        return json.dumps({"o": self.origin, **kw}, separators=(",", ":"))
+
+    # --- afsender ---
+    def notify(self, db, dates: Iterable[date], type_: Optional[str] = None, event: Optional[Dict] = None) -> None:
+        """Kaldes efter commit i mutations-ruterne (synkron Session)."""
+        if not self._active(db.get_bind().dialect.name):
+            return
+        body = {"d": sorted({d.isoformat() for d in dates})}
+        if type_:
+            body["t"], body["e"] = type_, event
+        try:
+            db.execute(select(func.pg_notify(CHANNEL, self._payload(**body))))
+            db.commit()
+            self.sent += 1
+        except Exception as e:
+            # bookingen er allerede gemt; de andre workers indhenter via TTL
+            db.rollback()
+            print(f"[notify] Kunne ikke sende: {getattr(e, 'orig', e)}")
+
+    def notify_catalog(self, connection) -> None:
+        """Fra mapper-events: leveres først når transaktionen committes."""
+        if self._active(connection.dialect.name):
+            connection.execute(select(func.pg_notify(CHANNEL, self._payload(c=1))))
+
+    # --- modtager ---
+    def _apply(self, raw: str) -> None:
+        msg = json.loads(raw)
+        if msg.get("o") == self.origin:
+            return
+        self.received += 1
+        if msg.get("d"):
+            versions.bump(date.fromisoformat(d) for d in msg["d"])
+        if msg.get("c"):
+            from app.core.catalog import catalog
+            catalog.invalidate()
+        if msg.get("t"):
+            hub.publish(msg["t"], msg.get("e") or {})
+
+    def _invalidate_all(self) -> None:
+        from app.core.catalog import catalog
+
+        versions.reset()
+        response_cache.clear()
+        catalog.invalidate()
+        hub.publish("resync", {})
+
+    async def _listen(self, conninfo: str) -> None:
+        import psycopg
+
+        first = True
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(conninfo, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    if not first:
+                        self.reconnects += 1
+                        self._invalidate_all()
+                    first = False
+                    async for n in conn.notifies():
+                        try:
+                            self._apply(n.payload)
+                        except Exception as e:
+                            print(f"[notify] Ugyldig besked: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[notify] Lytter mistede forbindelsen: {e}")
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    def start(self, engine) -> None:
+        if not self._active(engine.dialect.name) or self._task is not None:
+            return
+        # samme server/bruger som enginen, men en rå psycopg-forbindelse
+        conninfo = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        self._task = asyncio.get_running_loop().create_task(self._listen(conninfo))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self._task is not None,
+            "origin": self.origin,
+            "sent": self.sent,
+            "received": self.received,
+            "reconnects": self.reconnects,
+        }
+
+
+bus = ChangeBus()
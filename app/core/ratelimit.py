@@ -0,0 +1,170 @@
+"""Rate limiting pr. klient-IP (token bucket) for de offentlige endpoints.
+
+Hver IP har en spand med plads til RATE_LIMIT_BURST tokens, der fyldes op
+med RATE_LIMIT_RPS pr. sekund; hver request koster ét. Er spanden tom,
+svarer vi 429 med Retry-After (sekunder til næste token). RATE_LIMIT_RPS=0
+slår det fra.
+
+Kun requests der matcher en regel i RATE_LIMIT_PATHS tælles. En regel er
+"[METODE ]sti[*]": uden metode gælder den alle metoder, og en afsluttende *
+gør stien til et præfiks. Default er det den offentlige bookingside bruger:
+GET /api/resources, GET /api/availability* og POST /api/holds. Staff-tavlen
+deler IP med gæsterne bag stedets NAT, så dens requests skal aldrig ramme en
+429: requests med staff=1 (eller true) i query-strengen tælles ikke, og
+personalets /api/bookings, skrivninger, batch og eksport er ikke med i
+reglerne. Det samme gælder SSE, health og metrics.
+
+Klient-IP: bag Caddy er forbindelsens adresse altid proxyens. Vi går derfor
+X-Forwarded-For igennem fra højre og springer adresser i
+RATE_LIMIT_TRUSTED_PROXIES over; den første ikke-betroede er klienten. Caddy
+tilføjer selv den adresse den så, så et forfalsket header fra klienten
+ender til venstre og ignoreres. Kommer forbindelsen ikke fra en betroet
+proxy, bruges dens adresse direkte.
+
+Spandene ligger i hukommelsen pr. worker, så med WEB_CONCURRENCY=N er den
+samlede grænse op til N gange højere.
+"""
+from __future__ import annotations
+
+import ipaddress
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "10"))
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "40"))
+RATE_LIMIT_PATHS = os.getenv(
+    "RATE_LIMIT_PATHS", "GET /api/resources,GET /api/availability*,POST /api/holds"
+)
+STAFF_FLAG = re.compile(rb"(?:^|&)staff=(?:1|true)(?:&|$)", re.I)
+# loopback + private net (docker-netværket hvor Caddy kører)
+RATE_LIMIT_TRUSTED_PROXIES = os.getenv(
+    "RATE_LIMIT_TRUSTED_PROXIES", "127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16"
+)
+MAX_BUCKETS = 10_000
+
+
+Rule = Tuple[Optional[str], str, bool]   # (metode eller None, sti, præfiks?)
+
+
+def _rules(spec: str) -> List[Rule]:
+    out = []
+    for part in spec.split(","):
+        method, _, path = part.strip().rpartition(" ")
+        if not path:
+            continue
+        out.append((method.strip().upper() or None, path.rstrip("*"), path.endswith("*")))
+    return out
+
+
+def _networks(spec: str) -> List:
+    return [ipaddress.ip_network(p.strip(), strict=False) for p in spec.split(",") if p.strip()]
+
+
+class ClientIP:
+    def __init__(self, trusted: str = RATE_LIMIT_TRUSTED_PROXIES) -> None:
+        self.trusted = _networks(trusted)
+
+    def _is_trusted(self, ip: str) -> bool:
+        try:
+            addr = ipaddress.ip_address(ip)
+        except ValueError:
+            return False
+        return any(addr in net for net in self.trusted)
+
+    def __call__(self, scope) -> str:
+        peer = (scope.get("client") or ("", 0))[0]
+        if not self._is_trusted(peer):
+            return peer
+        xff = ""
+        for k, v in scope.get("headers", ()):
+            if k == b"x-forwarded-for":
+                xff = (xff + "," if xff else "") + v.decode("latin-1")
+        hops = [h.strip() for h in xff.split(",") if h.strip()]
+        for ip in reversed(hops):
+            if not self._is_trusted(ip):
+                return ip
+        return hops[0] if hops else peer
+
+
+class TokenBucketLimiter:
+    def __init__(self, rate: float = RATE_LIMIT_RPS, burst: int = RATE_LIMIT_BURST,
+                 max_buckets: int = MAX_BUCKETS) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_buckets = max_buckets
+        # ip -> (tokens, tidspunkt); mindst nyligt brugte først så de kan smides ud
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def take(self, key: str, now: Optional[float] = None) -> float:
+        """Tag ét token. Returnerer 0 hvis det lykkedes, ellers sekunder til næste token."""
+        now = time.monotonic() if now is None else now
+        tokens, ts = self._buckets.pop(key, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - ts) * self.rate)
+        if tokens >= 1.0:
+            self._buckets[key] = (tokens - 1.0, now)
+            wait = 0.0
+            self.allowed += 1
+        else:
+            self._buckets[key] = (tokens, now)
+            wait = (1.0 - tokens) / self.rate
+            self.limited += 1
+        # en fuld spand er det samme som ingen spand, så de ældste kan roligt droppes
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> Dict:
+        return {"enabled": self.enabled, "rate": self.rate, "burst": self.burst,
+                "clients": len(self._buckets), "allowed": self.allowed, "limited": self.limited}
+
+
+limiter = TokenBucketLimiter()
+
+
+class RateLimitMiddleware:
+    """Ren ASGI-middleware; kører i event-loopet, så spandene behøver ingen lås."""
+
+    def __init__(self, app, limiter: TokenBucketLimiter = limiter,
+                 paths: Union[str, Iterable[str]] = RATE_LIMIT_PATHS,
+                 client_ip: Optional[ClientIP] = None) -> None:
+        self.app = app
+        self.limiter = limiter
+        self.rules = _rules(paths if isinstance(paths, str) else ",".join(paths))
+        self.client_ip = client_ip or ClientIP()
+
+    def _limited(self, method: str, path: str, query: bytes = b"") -> bool:
+        if query and STAFF_FLAG.search(query):
+            return False
+        for m, p, prefix in self.rules:
+            if (m is None or m == method) and (path.startswith(p) if prefix else path == p):
+                return True
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or not self.limiter.enabled
+                or not self._limited(scope["method"], scope["path"], scope.get("query_string", b""))):
+            return await self.app(scope, receive, send)
+        wait = self.limiter.take(self.client_ip(scope))
+        if not wait:
+            return await self.app(scope, receive, send)
+        body = '{"detail":"For mange forespørgsler – prøv igen om lidt"}'.encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(wait))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
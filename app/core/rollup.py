@@ -0,0 +1,160 @@
+"""Forudberegnet belægning: occupancy_hourly (bord x time).
+
+Hver booking fordeles på de timer den dækker: optagede minutter pr. time og
+en tæller i den time den starter. Tabellen holdes ajour i samme transaktion
+som ændringen af bookingen – via mapper-events på Booking (oprettelse,
+forlængelse, sletning gennem ORM'en) og direkte fra batch-endpointet, der
+indsætter med bulk-INSERT. Arkivering (Core-DELETE) rører den ikke, så
+historikken bliver stående når bookinger flyttes til bookings_archive.
+
+Timerne er UTC, men Danmarks offset er hele timer, så en UTC-time er også
+en lokal time. Rapporterne (/api/reports/occupancy) læser kun herfra.
+
+Eksisterende data (og efter ændringer uden om ORM'en) genopbygges med
+
+    python -m app.core.rollup --backfill
+"""
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import delete, event, inspect, insert, select, text, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.core.tz import to_utc
+from app.db import get_engine
+from app.models import Booking, BookingArchive, OccupancyHourly
+
+HOUR = timedelta(hours=1)
+BACKFILL_YIELD_PER = 10_000
+
+# (resource_id, start, slut, +1/-1)
+Change = Tuple[int, datetime, datetime, int]
+
+
+def split_hours(s: datetime, e: datetime) -> Iterator[Tuple[datetime, float]]:
+    """(timens start, minutter i timen) for [s, e)."""
+    s, e = to_utc(s), to_utc(e)
+    h = s.replace(minute=0, second=0, microsecond=0)
+    while h < e:
+        nxt = h + HOUR
+        yield h, (min(e, nxt) - max(s, h)).total_seconds() / 60
+        h = nxt
+
+
+def _accumulate(changes: Iterable[Change], acc: Optional[Dict] = None) -> Dict[Tuple[int, datetime], List]:
+    acc = {} if acc is None else acc
+    for rid, s, e, sign in changes:
+        first = True
+        for h, minutes in split_hours(s, e):
+            cell = acc.setdefault((rid, h), [0.0, 0])
+            cell[0] += sign * minutes
+            if first:
+                cell[1] += sign
+                first = False
+    return acc
+
+
+def _rows(acc: Dict) -> List[Dict]:
+    return [{"resource_id": rid, "hour_utc": h, "busy_minutes": int(round(m)), "bookings": n}
+            for (rid, h), (m, n) in acc.items() if round(m) or n]
+
+
+def apply(connection, changes: Iterable[Change]) -> None:
+    """Læg ændringerne til tabellen (upsert) på den givne forbindelse/transaktion."""
+    rows = _rows(_accumulate(changes))
+    if not rows:
+        return
+    T = OccupancyHourly.__table__
+    ins = pg_insert(T) if connection.dialect.name == "postgresql" else sqlite_insert(T)
+    stmt = ins.on_conflict_do_update(
+        index_elements=[T.c.resource_id, T.c.hour_utc],
+        set_={"busy_minutes": T.c.busy_minutes + ins.excluded.busy_minutes,
+              "bookings": T.c.bookings + ins.excluded.bookings},
+    )
+    connection.execute(stmt, rows)
+
+
+def _span(target) -> Tuple[int, datetime, datetime]:
+    return target.resource_id, target.start_utc, target.end_utc
+
+
+def _on_insert(mapper, connection, target) -> None:
+    apply(connection, [(*_span(target), 1)])
+
+
+def _on_delete(mapper, connection, target) -> None:
+    apply(connection, [(*_span(target), -1)])
+
+
+def _on_update(mapper, connection, target) -> None:
+    state = inspect(target)
+    old = []
+    changed = False
+    for name in ("resource_id", "start_utc", "end_utc"):
+        hist = state.attrs[name].history
+        if hist.deleted:
+            changed = True
+            old.append(hist.deleted[0])
+        else:
+            old.append(getattr(target, name))
+    if changed:
+        apply(connection, [(*old, -1), (*_span(target), 1)])
+
+
+event.listen(Booking, "after_insert", _on_insert)
+event.listen(Booking, "after_update", _on_update)
+event.listen(Booking, "after_delete", _on_delete)
+
+
+def backfill() -> Dict:
+    """Genopbyg hele tabellen fra bookings + bookings_archive."""
+    engine = get_engine()
+    t0 = time.perf_counter()
+    acc: Dict = {}
+    n = 0
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            # samtidige bookinger venter på deres upsert til vi er færdige og
+            # lægger så deres ændring oveni den genopbyggede tabel
+            conn.execute(text("LOCK TABLE occupancy_hourly IN EXCLUSIVE MODE"))
+        conn.execute(delete(OccupancyHourly))
+        src = union_all(
+            select(Booking.resource_id, Booking.start_utc, Booking.end_utc),
+            select(BookingArchive.resource_id, BookingArchive.start_utc, BookingArchive.end_utc),
+        )
+        result = conn.execute(src, execution_options={"yield_per": BACKFILL_YIELD_PER})
+        for part in result.partitions():
+            _accumulate(((rid, s, e, 1) for rid, s, e in part), acc)
+            n += len(part)
+        rows = _rows(acc)
+        for i in range(0, len(rows), BACKFILL_YIELD_PER):
+            conn.execute(insert(OccupancyHourly), rows[i:i + BACKFILL_YIELD_PER])
+    return {"bookings": n, "rows": len(rows), "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def fetch(db, start: datetime, end: datetime, resource_ids: Optional[List[int]] = None):
+    """Rollup-rækker (resource_id, time, minutter, bookinger) for timer i [start, end)."""
+    T = OccupancyHourly
+    q = select(T.resource_id, T.hour_utc, T.busy_minutes, T.bookings).where(
+        T.hour_utc >= start, T.hour_utc < end)
+    if resource_ids is not None:
+        q = q.where(T.resource_id.in_(resource_ids))
+    return db.execute(q).all()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from app.models import init_db
+
+    ap = argparse.ArgumentParser(description="Vedligehold occupancy_hourly")
+    ap.add_argument("--backfill", action="store_true", help="genopbyg fra bookings + bookings_archive")
+    args = ap.parse_args()
+    if not args.backfill:
+        ap.error("angiv --backfill")
+    init_db()
+    print(backfill())
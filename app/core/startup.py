@@ -0,0 +1,106 @@
+"""Opstartsprofil: hvor går tiden fra `import app.main` til appen svarer?
+
+    python -m app.core.startup [--top 15] [--runs 3]
+
+1. Importtid: kører `python -X importtime -c "import app.main"` i nye
+   processer (median af --runs) og viser tiden pr. topniveau-pakke
+   (modulernes egen tid summeret, så intet tælles to gange) og de tungeste
+   enkeltmoduler med deres samlede tid.
+2. Boot: importerer appen her og måler init_db() og hele lifespan-opstarten
+   mod DB_URL – det er dét healthchecket i docker-compose venter på.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+
+
+def importtime(module: str = "app.main") -> List[Tuple[str, int, int, int]]:
+    """(modul, egen µs, samlet µs, dybde) for én frisk import af module."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, env=os.environ.copy())
+    if proc.returncode:
+        raise SystemExit(proc.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), (len(m.group(3)) - 1) // 2))
+    return rows
+
+
+def summarize(runs: List[List[Tuple[str, int, int, int]]]) -> Tuple[float, Dict[str, float], Dict[str, Tuple]]:
+    totals, by_pkg, by_mod = [], defaultdict(list), defaultdict(list)
+    for rows in runs:
+        totals.append(sum(s for _, s, _, _ in rows))
+        pkg = defaultdict(int)
+        for name, self_us, cum_us, _ in rows:
+            pkg[name.split(".")[0]] += self_us
+            by_mod[name].append((self_us, cum_us))
+        for k, v in pkg.items():
+            by_pkg[k].append(v)
+    med = {k: statistics.median(v) / 1000 for k, v in by_pkg.items()}
+    mods = {k: (statistics.median(s for s, _ in v) / 1000, statistics.median(c for _, c in v) / 1000)
+            for k, v in by_mod.items()}
+    return statistics.median(totals) / 1000, med, mods
+
+
+async def _lifespan(app) -> Tuple[float, float]:
+    t0 = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        up = time.perf_counter() - t0
+        t1 = time.perf_counter()
+    return up * 1000, (time.perf_counter() - t1) * 1000
+
+
+def boot() -> List[Tuple[str, float]]:
+    t0 = time.perf_counter()
+    from app import main
+    from app.models import init_db
+    phases = [("import app.main", (time.perf_counter() - t0) * 1000)]
+    t0 = time.perf_counter()
+    init_db()
+    phases.append(("init_db() (migrerer hvis nødvendigt)", (time.perf_counter() - t0) * 1000))
+    t0 = time.perf_counter()
+    init_db()
+    phases.append(("init_db() igen (schema-tjek)", (time.perf_counter() - t0) * 1000))
+    up, down = asyncio.run(_lifespan(main.app))
+    phases += [("lifespan opstart", up), ("lifespan nedlukning", down)]
+    return phases
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Importtid og boot-faser for appen")
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--module", default="app.main")
+    ap.add_argument("--no-boot", action="store_true", help="kun importtid (kræver ingen database)")
+    args = ap.parse_args()
+
+    total, pkgs, mods = summarize([importtime(args.module) for _ in range(args.runs)])
+    print(f"import {args.module}: {total:.0f} ms (median af {args.runs})\n")
+    print("pr. pakke (egen tid)")
+    for k, v in sorted(pkgs.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {k:<28} {v:8.1f} ms  {100 * v / total:5.1f} %")
+    print("\ntungeste moduler (samlet tid inkl. det de importerer)")
+    for k, (s, c) in sorted(mods.items(), key=lambda kv: -kv[1][1])[:args.top]:
+        print(f"  {k:<40} {c:8.1f} ms   egen {s:6.1f} ms")
+    if args.no_boot:
+        return
+    print("\nboot")
+    for label, ms in boot():
+        print(f"  {label:<40} {ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Tidszonemodel: UTC i databasen og internt, Europe/Copenhagen ved API-kanten.
+
+Klienter sender dato + klokkeslæt i lokal tid og får lokal tid med offset
+tilbage ("2026-10-24T19:00:00+02:00"). Alt derimellem – lagring, sammenligning
+og varighed – er aware UTC, så en booking over sommertidsskiftet varer det
+den skal, og en dag er præcis [lokal midnat, næste lokale midnat), også når
+den kun har 23 eller 25 timer.
+"""
+from __future__ import annotations
+
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Tuple
+from zoneinfo import ZoneInfo
+
+UTC = timezone.utc
+LOCAL_TZ = ZoneInfo(os.getenv("APP_TZ", "Europe/Copenhagen"))
+
+
+def local_to_utc(d: date, t: time) -> datetime:
+    """Lokal vægur-tid -> aware UTC.
+
+    Ved tilbagestilling (samme klokkeslæt to gange) vælges første forekomst.
+    Et klokkeslæt der ikke findes (fremstilling, fx 02:30) giver ValueError.
+    """
+    local = datetime.combine(d, t).replace(tzinfo=LOCAL_TZ, fold=0)
+    out = local.astimezone(UTC)
+    if out.astimezone(LOCAL_TZ).replace(tzinfo=None) != local.replace(tzinfo=None):
+        raise ValueError(f"{d} {t:%H:%M} findes ikke i {LOCAL_TZ.key} (sommertid)")
+    return out
+
+
+def to_utc(dt: datetime) -> datetime:
+    # naive værdier fra databasen (SQLite) er UTC
+    return dt.replace(tzinfo=UTC) if dt.tzinfo is None else dt.astimezone(UTC)
+
+
+def to_local(dt: datetime) -> datetime:
+    return to_utc(dt).astimezone(LOCAL_TZ)
+
+
+def local_iso(dt: datetime) -> str:
+    return to_local(dt).isoformat()
+
+
+def local_date(dt: datetime) -> date:
+    return to_local(dt).date()
+
+
+def day_bounds(d: date) -> Tuple[datetime, datetime]:
+    """[lokal midnat d, lokal midnat d+1) i UTC – 23/24/25 timer."""
+    return local_to_utc(d, time(0, 0)), local_to_utc(d + timedelta(days=1), time(0, 0))
+
+
+def now_utc() -> datetime:
+    return datetime.now(UTC)
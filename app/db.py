@@ -0,0 +1,164 @@
+"""Fælles SQLAlchemy-engine for hele appen.
+
+Både get_db (ruterne), init_db (bootstrap) og async-stiens threadpool-fallback
+bruger samme engine og dermed én connection-pool pr. proces. Enginen oprettes
+først ved første brug – i praksis i lifespan via init_db() – så import af
+modulerne ikke åbner forbindelser.
+
+Pool-politik styres med miljøvariabler:
+  DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT  – størrelse og ventetid
+  DB_POOL_RECYCLE   – sekunder før en forbindelse genåbnes (default 1800)
+  DB_POOL_PRE_PING  – ping ved hver checkout (default til; fanger døde
+                      forbindelser efter en Postgres-genstart, koster en
+                      round trip pr. request – benchmarks kan sætte 0)
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+
+DEFAULT_URL = "postgresql+psycopg://booking:booking@db:5432/booking"
+
+
+def _bool(v: Optional[str], default: bool = False) -> bool:
+    if v is None:
+        return default
+    return str(v).strip().lower() in {"1", "true", "yes", "y", "on"}
+
+
+def database_url() -> str:
+    return os.getenv("DB_URL") or os.getenv("DATABASE_URL") or DEFAULT_URL
+
+
+def pool_kwargs(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_pre_ping": _bool(os.getenv("DB_POOL_PRE_PING"), True),
+    }
+
+
+class PoolWaitStats:
+    """Tid brugt på at få en forbindelse ud af poolen (inkl. oprettelse)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.timeouts = 0
+        self._recent: deque[float] = deque(maxlen=512)
+
+    def record(self, ms: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+            self._recent.append(ms)
+
+    def timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            recent = sorted(self._recent)
+            return {
+                "checkouts": self.count,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(self.total_ms / self.count, 3) if self.count else None,
+                "wait_ms_p99": round(recent[min(len(recent) - 1, int(len(recent) * 0.99))], 3) if recent else None,
+                "wait_ms_max": round(self.max_ms, 3),
+            }
+
+
+wait_stats = PoolWaitStats()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool der måler hvor længe en checkout venter."""
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            wait_stats.timeout()
+            raise
+        finally:
+            wait_stats.record((time.perf_counter() - t0) * 1000)
+
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+_engine: Optional[Engine] = None
+_lock = threading.Lock()
+
+
+def get_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                url = database_url()
+                kwargs = pool_kwargs(url)
+                if url.startswith("sqlite"):
+                    kwargs["connect_args"] = {"check_same_thread": False}
+                if ":memory:" not in url:
+                    kwargs["poolclass"] = TimedQueuePool
+                _engine = create_engine(url, **kwargs)
+                SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+def get_db():
+    get_engine()
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def pool_stats() -> Dict:
+    if _engine is None:
+        return {"created": False}
+    pool = _engine.pool
+    out: Dict = {
+        "created": True,
+        "dialect": _engine.dialect.name,
+        "pool": type(pool).__name__,
+        "pre_ping": bool(getattr(pool, "_pre_ping", False)),
+        "recycle": getattr(pool, "_recycle", None),
+    }
+    if isinstance(pool, QueuePool):
+        out.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": pool._max_overflow,
+        })
+    out.update(wait_stats.snapshot())
+    return out
+
+
+def dispose() -> None:
+    # næste get_engine() bygger en ny engine i stedet for at returnere den lukkede
+    global _engine
+    with _lock:
+        engine, _engine = _engine, None
+    if engine is not None:
+        engine.dispose()
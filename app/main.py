@@ -1,20 +1,42 @@
 from __future__ import annotations
 
 import os
+import json
+import asyncio
+import threading
+from time import perf_counter
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, time as time_cls
-from typing import Optional, List, Dict
+from bisect import bisect_right
+from typing import Optional, List, Dict, Literal, Tuple
 
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, status
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Depends, Header, HTTPException, BackgroundTasks, Request, status
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, EmailStr, field_validator
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import Integer, bindparam, insert, select, text, union_all
+from sqlalchemy.exc import IntegrityError
 from fastapi import Query
 
+try:
+    import orjson
+except ImportError:  # valgfri – falder tilbage til stdlib json
+    orjson = None
+
 # --- Åbningsregler: KUN fredag/lørdag 19:00-23:00 ---
 ALLOWED_DAYS = {4, 5}        # 0=man ... 4=fri, 5=lør
 ALLOWED_START_HOUR = 19
 ALLOWED_END_HOUR = 23
+STAFF_CLOSE_HOUR = 4         # staff må booke frem til kl. 04:00 næste dag
+STREAM_PING_SECONDS = 15     # SSE-kommentar så proxies ikke lukker forbindelsen
+MAX_RANGE_DAYS = 62          # øvre grænse for /api/availability/range
+BOOKINGS_YIELD_PER = 1000    # rækker pr. batch når /api/bookings streamer fra DB
+MAX_BATCH_ITEMS = 500        # øvre grænse for /api/bookings/batch (efter udfoldning)
+AUTO_ASSIGN_ROUNDS = 3       # nye opslag hvis alle kandidater blev taget undervejs
+RESOURCE_KINDS = {"pool", "shuffle"}
+MAX_REPORT_DAYS = 400        # øvre grænse for /api/reports/occupancy
+MAX_EXPORT_DAYS = 366        # øvre grænse for /api/bookings/export (et år ad gangen)
+WEEKDAY_NAMES = ("mandag", "tirsdag", "onsdag", "torsdag", "fredag", "lørdag", "søndag")
 
 def _is_allowed_day(d) -> bool:
     # d kan være date eller datetime
@@ -22,7 +44,8 @@ def _is_allowed_day(d) -> bool:
     return wd in ALLOWED_DAYS
 
 def _is_within_allowed_window(start_dt: datetime, end_dt: datetime) -> bool:
-    # Begge tider skal ligge på samme dato og indenfor [19:00, 23:00]
+    # Begge tider skal ligge på samme (lokale) dato og indenfor [19:00, 23:00]
+    start_dt, end_dt = to_local(start_dt).replace(tzinfo=None), to_local(end_dt).replace(tzinfo=None)
     if start_dt.date() != end_dt.date():
         return False
     if not _is_allowed_day(start_dt.date()):
@@ -32,48 +55,88 @@ def _is_within_allowed_window(start_dt: datetime, end_dt: datetime) -> bool:
     return start_dt >= day_start and end_dt <= day_end
 
 
-# ---- get_db fallback (virker også uden din egen app.db) ----
-def _resolve_get_db():
-    try:
-        from app.db import get_db as _get_db
-        return _get_db
-    except Exception:
-        pass
+# ---- én fælles engine/pool (app/db.py) ----
+from app import db as app_db
+from app.db import get_db
 
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import sessionmaker
+# ---- modeller ----
+from app import models
+from app.models import Booking, BookingArchive, UTCDateTime, init_db  # din models.py
+from app.core.tz import LOCAL_TZ, day_bounds, local_date, local_iso, local_to_utc, now_utc, to_local, to_utc
+from app.core.catalog import catalog
+from app.core.events import hub
+from app.core.cache import versions, response_cache, single_flight
+from app.core import async_db
+from app.core.async_db import run_db
+from app.core.metrics import metrics, MetricsMiddleware
+from app.core.ratelimit import RateLimitMiddleware, limiter
+from app.core.idempotency import idempotency
+from app.core.holds import holds, sweeper as hold_sweeper
+from app.core import export, rollup
+from app.core.notify import bus
+from app.core.archive import archive_cutoff, job as archive_job
+from app.core.availability import SLOT_GRANULARITIES, merge_busy, slot_grid, busy_json, occupancy_bits, timeline
 
-    DATABASE_URL = os.getenv(
-        "DB_URL",
-        os.getenv("DATABASE_URL", "postgresql+psycopg://booking:booking@db:5432/booking")
-    )
-    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Valgfri mail – app.core.email (fastapi_mail, aiosmtplib) importeres først ved
+# første mail og ikke ved opstart; _mail_mod er None indtil da, False hvis
+# importen fejlede
+_mail_mod = None
+_mail_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
 
-    def _get_db():
-        db = SessionLocal()
+def _mail():
+    """app.core.email med kørende dispatcher, eller None hvis mail ikke er tilgængelig."""
+    global _mail_mod
+    if _mail_mod is None:
+        with _mail_lock:
+            if _mail_mod is None:
+                try:
+                    from app.core import email as m
+                    _mail_mod = m
+                except Exception as e:
+                    print(f"[mail] Mail-modulet kunne ikke indlæses: {e}")
+                    _mail_mod = False
+    m = _mail_mod or None
+    if m is not None and not m.dispatcher.running and _loop is not None:
+        # ruterne der sender mail er synkrone (threadpool); dispatcheren skal
+        # startes i event-loopet
         try:
-            yield db
-        finally:
-            db.close()
-    return _get_db
-
-get_db = _resolve_get_db()
-
-# ---- modeller ----
-from app.models import Booking, Resource  # din models.py
-
-# Valgfri mail
-try:
-    from app.core.email import send_booking_confirmation, BookingEmailData
-    MAIL_ENABLED = True
-except Exception:
-    MAIL_ENABLED = False
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is None:
+            asyncio.run_coroutine_threadsafe(m.dispatcher.start(), _loop).result(5)
+    return m
 
 from fastapi.staticfiles import StaticFiles
 
-app = FastAPI(title="Pool & Shuffle Booking API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Engangs-bootstrap: tabeller, migration og seed køres ved opstart,
+    # ikke længere ved hvert kald til /api/resources
+    global _loop
+    _loop = asyncio.get_running_loop()
+    init_db()
+    catalog.invalidate()
+    hub.bind(_loop)
+    bus.start(app_db.get_engine())
+    archive_job.start()
+    hold_sweeper.start(_holds_expired)
+    yield
+    await hold_sweeper.stop()
+    if _mail_mod:
+        await _mail_mod.dispatcher.stop()
+    await bus.stop()
+    await archive_job.stop()
+    await async_db.dispose()
+    app_db.dispose()
+
+app = FastAPI(title="Pool & Shuffle Booking API", lifespan=lifespan)
 app.mount("/static", StaticFiles(directory="static"), name="static")
+# Sidst tilføjet ligger yderst: metrics ser også de 429'ere rate limiteren giver
+app.add_middleware(RateLimitMiddleware, limiter=limiter)
+# SSE-forbindelser lever i timevis og ville ødelægge latens-histogrammet
+app.add_middleware(MetricsMiddleware, skip={"/api/stream", "/api/metrics"})
 
 # ---------- kolonne-helpers (autodetect) ----------
 def _col(model, candidates):
@@ -88,16 +151,14 @@ BOOKING_END_COL   = _col(Booking,   ["end_utc",   "end",   "end_time",   "end_dt
 
 
 # ---------- schemas ----------
-class BookingCreate(BaseModel):
-    resource_id: int
+class HoldCreate(BaseModel):
+    resource_id: Optional[int] = None
+    kind: Optional[str] = None        # uden resource_id: vælg selv et ledigt bord af denne type
     date: str
     start_time: Optional[str] = None  # "HH:MM"
     hour: Optional[int] = None        # alternativ til start_time
     duration: Optional[int] = 60
-    name: str
-    phone: Optional[str] = None
-    email: Optional[EmailStr] = None
-    is_staff: bool = False    
+    is_staff: bool = False
 
     @field_validator("date")
     @classmethod
@@ -112,6 +173,24 @@ class BookingCreate(BaseModel):
             datetime.strptime(v, "%H:%M")
         return v
 
+class BookingCreate(HoldCreate):
+    name: str
+    phone: Optional[str] = None
+    email: Optional[EmailStr] = None
+
+class HoldConfirm(BaseModel):
+    name: str
+    phone: Optional[str] = None
+    email: Optional[EmailStr] = None
+
+class HoldRead(BaseModel):
+    id: str
+    resource_id: int
+    start_iso_local: str
+    end_iso_local: str
+    expires_iso_local: str
+    ttl_seconds: int
+
 class BookingExtend(BaseModel):
     add_minutes: int
 
@@ -126,8 +205,32 @@ class BookingRead(BaseModel):
     class Config:
         from_attributes = True
 
+class BookingBatchItem(BaseModel):
+    resource_id: int
+    date: str
+    start_time: str                   # "HH:MM"
+    duration: int = 60
+    name: str
+    phone: Optional[str] = None
+
+class BookingRecurrence(BaseModel):
+    # fx en liga: bord 1-4 hver fredag kl. 19 i 10 uger
+    resource_ids: List[int]
+    start_date: str
+    weeks: int = 1
+    weekdays: Optional[List[int]] = None   # 0=man ... 6=søn; default start_date's ugedag
+    start_time: str
+    duration: int = 60
+    name: str
+    phone: Optional[str] = None
+
+class BookingBatch(BaseModel):
+    items: List[BookingBatchItem] = []
+    recurrence: Optional[BookingRecurrence] = None
+    mode: Literal["all", "partial"] = "all"   # all: alt eller intet; partial: opret dem der kan
+
 # ---------- utils ----------
-def _parse_start(p: BookingCreate) -> time_cls:
+def _parse_start(p: HoldCreate) -> time_cls:
     if p.start_time:
         return datetime.strptime(p.start_time, "%H:%M").time()
     if p.hour is not None:
@@ -137,127 +240,642 @@ def _parse_start(p: BookingCreate) -> time_cls:
         return time_cls(h, 0)
     raise HTTPException(422, "Angiv enten start_time eller hour")
 
-def _compose(local_date: str, start_t: time_cls, dur: int):
-    s = datetime.combine(datetime.strptime(local_date, "%Y-%m-%d").date(), start_t)
+def _compose(day: str, start_t: time_cls, dur: int):
+    # lokal dato + klokkeslæt -> aware UTC; varigheden lægges til i UTC
+    try:
+        s = local_to_utc(datetime.strptime(day, "%Y-%m-%d").date(), start_t)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
     return s, s + timedelta(minutes=dur)
 
 def _resource_name(db: Session, rid: int) -> str:
-    r = db.query(Resource).filter(Resource.id == rid).first()
-    return r.name if r else f"#{rid}"
+    # fra resource-kataloget – ingen ekstra forespørgsel pr. booking
+    r = catalog.get(db, rid)
+    return r["name"] if r else f"#{rid}"
 
-def ensure_tables_and_seed(db: Session):
-    # create tables if missing
-    try:
-        Resource.__table__.create(bind=db.get_bind(), checkfirst=True)
-        Booking.__table__.create(bind=db.get_bind(), checkfirst=True)
-    except Exception:
-        pass
-    # seed resources hvis tomt
-    try:
-        count = db.query(Resource).count()
-    except Exception:
-        return
-    if count > 0:
-        return
-    pool_n = int(os.getenv("POOL_COUNT", "3"))
-    shuffle_n = int(os.getenv("SHUFFLE_COUNT", "2"))
-    items = []
-    for i in range(1, pool_n + 1):
-        r = Resource(name=f"Pool {i}")
-        if hasattr(Resource, "kind"): setattr(r, "kind", "pool")
-        items.append(r)
-    for i in range(1, shuffle_n + 1):
-        r = Resource(name=f"Shuffle {i}")
-        if hasattr(Resource, "kind"): setattr(r, "kind", "shuffle")
-        items.append(r)
-    db.add_all(items)
-    db.commit()
+def _day_window(d, staff: bool):
+    # åbner altid 19:00; offentlig side stopper 23:00, staff kl. 04:00 næste dag
+    # (lokal vægur-tid, returneres som aware UTC)
+    open_dt = local_to_utc(d, time_cls(ALLOWED_START_HOUR, 0))
+    if staff:
+        close_dt = local_to_utc(d + timedelta(days=1), time_cls(STAFF_CLOSE_HOUR, 0))
+    else:
+        close_dt = local_to_utc(d, time_cls(ALLOWED_END_HOUR, 0))
+    return open_dt, close_dt
+
+def _busy_rows(db: Session, start_dt: datetime, end_dt: datetime, resource_ids: Optional[List[int]] = None,
+               with_id: bool = False, with_holds: bool = False):
+    # Én range-forespørgsel for alle borde, sorteret til sweep. with_holds:
+    # levende hold (app/core/holds.py) tæller som optaget
+    cols = (Booking.id,) if with_id else ()
+    q = (
+        db.query(*cols, Booking.resource_id, BOOKING_START_COL, BOOKING_END_COL)
+        .filter(BOOKING_START_COL < end_dt, BOOKING_END_COL > start_dt)
+    )
+    if resource_ids is not None:
+        q = q.filter(Booking.resource_id.in_(resource_ids))
+    rows = q.order_by(Booking.resource_id.asc(), BOOKING_START_COL.asc()).all()
+    if with_id:
+        return [(bid, rid, to_utc(s), to_utc(e)) for bid, rid, s, e in rows]
+    out = [(rid, to_utc(s), to_utc(e)) for rid, s, e in rows]
+    if with_holds:
+        held = holds.live(db, start_dt, end_dt, resource_ids)
+        if held:
+            out = sorted(out + held, key=lambda r: (r[0], r[1]))
+    return out
+
+def _is_overlap_violation(exc: IntegrityError) -> bool:
+    # 23P01 = exclusion_violation (Postgres)
+    orig = getattr(exc, "orig", None)
+    return getattr(orig, "sqlstate", None) == "23P01" or models.OVERLAP_CONSTRAINT in str(orig)
+
+def _has_overlap(db: Session, resource_id: int, s_dt: datetime, e_dt: datetime, exclude_id: Optional[int] = None) -> bool:
+    # Kun fallback når databasen ikke selv håndhæver overlap (fx SQLite)
+    q = (
+        db.query(Booking.id)
+        .filter(Booking.resource_id == resource_id)
+        .filter(BOOKING_START_COL < e_dt, BOOKING_END_COL > s_dt)
+    )
+    if exclude_id is not None:
+        q = q.filter(Booking.id != exclude_id)
+    return q.first() is not None
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    return any(t.strip().removeprefix("W/") == etag for t in inm.split(","))
+
+def _dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+async def _cached_json(request: Request, key: tuple, version: int, build, shape=None) -> Response:
+    # ETag = proces-epoch + datoversion + nøgle; 304 og cache-hit rører ikke databasen.
+    # build(db) henter rækkerne og køres kun ved cache-miss, via run_db (async
+    # eller threadpool). shape(rækker) bygger svaret uden for event-loopet og
+    # må returnere færdige JSON-bytes eller et objekt der serialiseres dér.
+    etag = f'"{versions.epoch}-{version}-{abs(hash(key)):x}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    ckey = key + (versions.epoch, version)
+    body = response_cache.get(ckey)
+    if body is None:
+        # samtidige miss på samme nøgle deler én beregning
+        def to_bytes(rows) -> bytes:
+            out = rows if shape is None else shape(rows)
+            return out if isinstance(out, bytes) else _dumps(out)
+
+        async def miss() -> bytes:
+            out = await run_db(build, shape=to_bytes)
+            response_cache.put(ckey, out)
+            return out
+        body = await single_flight.do(ckey, miss)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _touch_dates(start_dt: datetime, end_dt: datetime) -> List:
+    # En booking kan ligge i dagens staff-vindue (til 04:00) for dagen før
+    s = local_date(start_dt)
+    e = local_date(end_dt)
+    dates = [s - timedelta(days=1)] + [s + timedelta(days=k) for k in range((e - s).days + 1)]
+    versions.bump(dates)
+    return dates
+
+def _announce(db: Session, start_dt: datetime, end_dt: datetime, type_: str, event: Dict) -> None:
+    # Efter commit: ugyldiggør datoerne, send SSE-delta lokalt og bed de
+    # andre workers gøre det samme (LISTEN/NOTIFY, kun Postgres)
+    dates = _touch_dates(start_dt, end_dt)
+    hub.publish(type_, event)
+    bus.notify(db, dates, type_, event)
+
+def _booking_event(b: "BookingRead") -> Dict:
+    # /api/stream er åben for alle – kun id og tider, ingen navne/telefonnumre;
+    # staff-tavlen henter detaljerne via /api/bookings
+    return {"id": b.id, "resource_id": b.resource_id,
+            "start_iso_local": b.start_iso_local, "end_iso_local": b.end_iso_local}
 
 # ---------- routes ----------
 @app.get("/api/health")
 def health() -> Dict[str, str]:
     return {"status": "ok"}
 
+# Pool-headroom under denne andel af kapaciteten giver "degraded"
+HEALTH_MIN_HEADROOM = 0.1
+
+@app.get("/api/health/deep")
+def health_deep():
+    # Rører databasen (SELECT 1) og vurderer hvor meget luft der er i poolen
+    t0 = perf_counter()
+    try:
+        with app_db.get_engine().connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+    except Exception as e:
+        return JSONResponse(
+            {"status": "down", "db": {"ok": False, "error": str(getattr(e, "orig", e))}},
+            status_code=503,
+        )
+    db_ms = round((perf_counter() - t0) * 1000, 2)
+    pool = app_db.pool_stats()
+    out = {"status": "ok", "db": {"ok": True, "latency_ms": db_ms}, "pool": pool}
+    if "size" in pool:
+        capacity = pool["size"] + max(pool["max_overflow"], 0)
+        headroom = capacity - pool["checked_out"]
+        pool["headroom"] = headroom
+        if capacity and headroom / capacity < HEALTH_MIN_HEADROOM:
+            out["status"] = "degraded"
+    return out
+
+@app.get("/api/metrics", include_in_schema=False)
+def metrics_export():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def _collect_runtime():
+    # Læses ved hver scrape: mailkø, response-cache, pool og SSE-klienter
+    if _mail_mod:
+        st = _mail_mod.dispatcher.stats()
+        yield "mail_queue_depth", "gauge", (), st["queue_depth"]
+        for k in ("sent", "failed", "dropped", "retried"):
+            yield "mail_messages_total", "counter", (("outcome", k),), st[k]
+    cs = response_cache.stats()
+    for k in ("hits", "misses", "not_modified"):
+        if k in cs:
+            yield "response_cache_total", "counter", (("result", k),), cs[k]
+    ps = app_db.pool_stats()
+    for k in ("checked_out", "overflow"):
+        if k in ps:
+            yield f"db_pool_{k}", "gauge", (), ps[k]
+    for k in ("checkouts", "timeouts"):
+        if k in ps:
+            yield f"db_pool_{k}_total", "counter", (), ps[k]
+    if ps.get("wait_ms_max") is not None:
+        yield "db_pool_wait_ms_max", "gauge", (), ps["wait_ms_max"]
+    sf = single_flight.stats()
+    yield "single_flight_total", "counter", (("role", "leader"),), sf["leaders"]
+    yield "single_flight_total", "counter", (("role", "shared"),), sf["shared"]
+    rl = limiter.stats()
+    yield "rate_limit_total", "counter", (("result", "allowed"),), rl["allowed"]
+    yield "rate_limit_total", "counter", (("result", "limited"),), rl["limited"]
+    yield "rate_limit_clients", "gauge", (), rl["clients"]
+    hs = holds.stats()
+    for k in ("placed", "conflicts", "confirmed", "released", "expired"):
+        yield "holds_total", "counter", (("result", k),), hs[k]
+    ist = idempotency.stats()
+    for k in ("claimed", "replayed", "in_progress", "mismatched", "abandoned", "purged"):
+        yield "idempotency_keys_total", "counter", (("result", k),), ist[k]
+    yield "sse_subscribers", "gauge", (), hub.subscribers
+    ns = bus.stats()
+    yield "notify_messages_total", "counter", (("direction", "sent"),), ns["sent"]
+    yield "notify_messages_total", "counter", (("direction", "received"),), ns["received"]
+    yield "notify_reconnects_total", "counter", (), ns["reconnects"]
+
+metrics.add_collector(_collect_runtime)
+
+@app.get("/api/mail/stats")
+def mail_stats():
+    # kødybde, udfald og latens (kø -> afsendt) for bekræftelsesmails
+    if _mail_mod is None:
+        # endnu ingen mail i denne worker – mailstakken er ikke indlæst
+        return {"enabled": None, "loaded": False}
+    if not _mail_mod:
+        return {"enabled": False}
+    return {"enabled": True, **_mail_mod.dispatcher.stats()}
+
+@app.get("/api/cache/stats")
+def cache_stats():
+    return {**response_cache.stats(), "single_flight": single_flight.stats(), "rate_limit": limiter.stats()}
+
+@app.get("/api/diagnostics/db")
+def db_diagnostics():
+    # pool-statistik: checked out, overflow og ventetid på checkout
+    return {"sync": app_db.pool_stats(), "async": async_db.pool_stats(), "notify": bus.stats(),
+            "archive": archive_job.stats(), "pid": os.getpid()}
+
 @app.get("/api/resources")
-def resources(db: Session = Depends(get_db)):
-    ensure_tables_and_seed(db)
-    rows = db.query(Resource).order_by(Resource.id.asc()).all()
-    return [{"id": r.id, "name": r.name, "kind": getattr(r, "kind", "pool")} for r in rows]
+async def resources():
+    rows = catalog.cached()
+    if rows is None:
+        rows = await single_flight.do(("resources", catalog.version), lambda: run_db(catalog.all))
+    return rows
 
 @app.get("/api/availability")
-def availability(
+async def availability(
+    request: Request,
     date: str,
     staff: bool = Query(False),
-    db: Session = Depends(get_db)
+    step: int = Query(60, description="Slot-granularitet i minutter (30 eller 60)"),
 ):
+    if step not in SLOT_GRANULARITIES:
+        raise HTTPException(422, "step skal være 30 eller 60")
     d = datetime.strptime(date, "%Y-%m-%d").date()
+    return await _cached_json(
+        request, ("availability", d, staff, step, catalog.version), versions.get(d),
+        lambda db: _availability_rows(db, d, staff),
+        lambda data: _availability_shape(data, d, staff, step),
+    )
 
-    # åbner altid 19:00
-    open_dt = datetime.combine(d, time_cls(19, 0))
-
-    if staff:
-        # staff må booke frem til kl. 04:00 næste dag
-        close_dt = datetime.combine(d + timedelta(days=1), time_cls(4, 0))
-    else:
-        # offentlig side stopper kl. 23:00 samme dag
-        close_dt = datetime.combine(d, time_cls(23, 0))
-
-    rows = db.query(Resource).all()
+def _availability_payload(db: Session, d, staff: bool, step: int) -> Dict:
+    return _availability_shape(_availability_rows(db, d, staff), d, staff, step)
 
+def _availability_rows(db: Session, d, staff: bool):
+    open_dt, close_dt = _day_window(d, staff)
+    rids = [r["id"] for r in catalog.all(db)]
     # Offentlig side må slet ikke booke på hverdage
-    if (not staff) and (d.weekday() not in {4, 5}):
+    if (not staff) and (d.weekday() not in ALLOWED_DAYS):
+        return rids, None
+    return rids, _busy_rows(db, open_dt, close_dt, with_holds=True)
+
+def _availability_shape(data, d, staff: bool, step: int) -> Dict:
+    rids, rows = data
+    open_dt, close_dt = _day_window(d, staff)
+    if rows is None:
         return {
-            "open_local": open_dt.isoformat(),
-            "close_local": close_dt.isoformat(),
-            "resources": {r.id: [] for r in rows}
+            "open_local": local_iso(open_dt),
+            "close_local": local_iso(close_dt),
+            "granularity": step,
+            "resources": {rid: [] for rid in rids},
+            "busy": {rid: [] for rid in rids},
+        }
+
+    busy = merge_busy(rows)
+    return {
+        "open_local": local_iso(open_dt),
+        "close_local": local_iso(close_dt),
+        "granularity": step,
+        "resources": {rid: slot_grid(busy.get(rid, []), open_dt, close_dt, step, LOCAL_TZ) for rid in rids},
+        # kun tidsintervaller – ingen navne/telefonnumre til anonyme klienter
+        "busy": {rid: busy_json(busy.get(rid, []), LOCAL_TZ) for rid in rids},
+    }
+
+@app.get("/api/availability/range")
+async def availability_range(
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to"),
+    kind: Optional[str] = Query(None, description="pool eller shuffle"),
+    staff: bool = Query(False),
+    step: int = Query(60, description="Slot-granularitet i minutter (30 eller 60)"),
+):
+    if step not in SLOT_GRANULARITIES:
+        raise HTTPException(422, "step skal være 30 eller 60")
+    if kind is not None and kind not in RESOURCE_KINDS:
+        raise HTTPException(422, "kind skal være pool eller shuffle")
+    d0 = datetime.strptime(date_from, "%Y-%m-%d").date()
+    d1 = datetime.strptime(date_to, "%Y-%m-%d").date()
+    if d1 < d0:
+        raise HTTPException(422, "to skal være samme dag eller efter from")
+    n_days = (d1 - d0).days + 1
+    if n_days > MAX_RANGE_DAYS:
+        raise HTTPException(422, f"Perioden må højst være {MAX_RANGE_DAYS} dage")
+    return await run_db(_range_rows, d0, d1, kind, staff,
+                        shape=lambda data: _range_shape(data, d0, d1, n_days, staff, step))
+
+def _range_payload(db: Session, d0, d1, n_days: int, kind: Optional[str], staff: bool, step: int) -> Dict:
+    return _range_shape(_range_rows(db, d0, d1, kind, staff), d0, d1, n_days, staff, step)
+
+def _range_rows(db: Session, d0, d1, kind: Optional[str], staff: bool):
+    rids = [r["id"] for r in catalog.all(db) if kind is None or r["kind"] == kind]
+    # Én forespørgsel for hele perioden – fra første åbning til sidste lukning
+    range_open, _ = _day_window(d0, staff)
+    _, range_close = _day_window(d1, staff)
+    return rids, _busy_rows(db, range_open, range_close, rids, with_holds=True) if rids else []
+
+def _range_shape(data, d0, d1, n_days: int, staff: bool, step: int) -> Dict:
+    rids, rows = data
+    busy = merge_busy(rows) if rids else {}
+    ends = {rid: [e for _, e in ivs] for rid, ivs in busy.items()}
+
+    days = {}
+    for k in range(n_days):
+        d = d0 + timedelta(days=k)
+        open_dt, close_dt = _day_window(d, staff)
+        bookable = staff or d.weekday() in ALLOWED_DAYS
+        occupancy = {}
+        labels: List[str] = []
+        if bookable:
+            for rid in rids:
+                ivs = busy.get(rid, [])
+                # spring direkte til første interval der slutter efter åbning
+                lo = bisect_right(ends[rid], open_dt) if ivs else 0
+                slots = slot_grid(ivs[lo:], open_dt, close_dt, step, LOCAL_TZ)
+                occupancy[rid] = occupancy_bits(slots)
+                if not labels:
+                    labels = [s["label"] for s in slots]
+        days[d.isoformat()] = {
+            "open_local": local_iso(open_dt),
+            "close_local": local_iso(close_dt),
+            "bookable": bookable,
+            "slots": labels,
+            "occupancy": occupancy,
         }
 
-    # Lav timeslots i hele timer
-    slots = []
-    cur = open_dt
-    while cur < close_dt:
-        slots.append({"label": cur.strftime("%H:00"), "iso_start_local": cur.isoformat()})
-        cur += timedelta(hours=1)
+    return {
+        "from": d0.isoformat(),
+        "to": d1.isoformat(),
+        "granularity": step,
+        "resources": rids,
+        "days": days,
+    }
+
+@app.get("/api/timeline")
+async def day_timeline(request: Request, date: str):
+    # Staff-tavlen: optaget/ledigt, udnyttelse og næste booking der slutter pr.
+    # bord. "nu" rundes ned til hele minutter, så svaret kan caches et minut ad gangen.
+    d = datetime.strptime(date, "%Y-%m-%d").date()
+    now = now_utc().replace(second=0, microsecond=0)
+    return await _cached_json(
+        request, ("timeline", d, catalog.version, now), versions.get(d),
+        lambda db: _timeline_rows(db, d),
+        lambda data: _timeline_shape(data, d, now),
+    )
+
+def _timeline_payload(db: Session, d, now: datetime) -> Dict:
+    return _timeline_shape(_timeline_rows(db, d), d, now)
 
+def _timeline_rows(db: Session, d):
+    open_dt, close_dt = _day_window(d, True)
+    # med bookinger der startede før åbning eller slutter efter lukketid
+    return catalog.all(db), _busy_rows(db, open_dt, close_dt, with_id=True)
+
+def _timeline_shape(data, d, now: datetime) -> Dict:
+    res, rows = data
+    open_dt, close_dt = _day_window(d, True)
+    per = timeline(rows, [r["id"] for r in res], open_dt, close_dt, now, LOCAL_TZ)
+    busy = sum(t["busy_minutes"] for t in per.values())
+    total = busy + sum(t["free_minutes"] for t in per.values())
     return {
-        "open_local": open_dt.isoformat(),
-        "close_local": close_dt.isoformat(),
-        "resources": {r.id: slots for r in rows}
+        "date": d.isoformat(),
+        "open_local": local_iso(open_dt),
+        "close_local": local_iso(close_dt),
+        "now_local": local_iso(now),
+        "utilization_pct": round(100 * busy / total, 1) if total else 0.0,
+        "resources": [{"id": r["id"], "name": r["name"], "kind": r["kind"], **per[r["id"]]} for r in res],
     }
 
+@app.get("/api/reports/occupancy")
+async def occupancy_report(
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to"),
+    group: Literal["hour", "weekday", "resource", "kind"] = Query("weekday"),
+    kind: Optional[str] = Query(None, description="pool eller shuffle"),
+):
+    if kind is not None and kind not in RESOURCE_KINDS:
+        raise HTTPException(422, "kind skal være pool eller shuffle")
+    d0 = datetime.strptime(date_from, "%Y-%m-%d").date()
+    d1 = datetime.strptime(date_to, "%Y-%m-%d").date()
+    if d1 < d0:
+        raise HTTPException(422, "to skal være samme dag eller efter from")
+    if (d1 - d0).days + 1 > MAX_REPORT_DAYS:
+        raise HTTPException(422, f"Perioden må højst være {MAX_REPORT_DAYS} dage")
+    body = await run_db(_occupancy_rows, d0, d1, kind,
+                        shape=lambda data: _dumps(_occupancy_shape(data, d0, d1, group, kind)))
+    return Response(content=body, media_type="application/json")
+
+def _occupancy_payload(db: Session, d0, d1, group: str, kind: Optional[str]) -> Dict:
+    return _occupancy_shape(_occupancy_rows(db, d0, d1, kind), d0, d1, group, kind)
+
+def _occupancy_rows(db: Session, d0, d1, kind: Optional[str]):
+    # Læser kun occupancy_hourly
+    res = [r for r in catalog.all(db) if kind is None or r["kind"] == kind]
+    range_open, _ = _day_window(d0, True)
+    _, range_close = _day_window(d1, True)
+    return res, list(rollup.fetch(db, range_open, range_close, [r["id"] for r in res]))
+
+def _occupancy_shape(data, d0, d1, group: str, kind: Optional[str]) -> Dict:
+    # En dag er staff-vinduet (19:00 til 04:00), så natten til lørdag tæller
+    # med fredag. Kapacitet = åbne timer x borde.
+    res, hours = data
+    by_id = {r["id"]: r for r in res}
+    shift = timedelta(hours=STAFF_CLOSE_HOUR)
+
+    def key(local: datetime, rid: int):
+        if group == "hour":
+            return local.hour
+        if group == "weekday":
+            return (local - shift).weekday()
+        if group == "resource":
+            return rid
+        return by_id[rid]["kind"]
+
+    cells: Dict = {}
+    def cell(k):
+        return cells.setdefault(k, {"busy_minutes": 0, "bookings": 0, "capacity_minutes": 0})
+
+    n_days = (d1 - d0).days + 1
+    window = set()
+    for k in range(n_days):
+        open_dt, close_dt = _day_window(d0 + timedelta(days=k), True)
+        h = open_dt
+        while h < close_dt:
+            window.add(h)
+            local = to_local(h)
+            for r in res:
+                cell(key(local, r["id"]))["capacity_minutes"] += 60
+            h += timedelta(hours=1)
+
+    for rid, h, minutes, n in hours:
+        # kun timer i åbningsvinduet, ligesom kapaciteten – ellers kan en
+        # staff-booking om eftermiddagen give over 100 %
+        if h not in window:
+            continue
+        c = cell(key(to_local(h), rid))
+        c["busy_minutes"] += minutes
+        c["bookings"] += n
+
+    def label(k):
+        if group == "hour":
+            return f"{k:02d}:00"
+        if group == "weekday":
+            return WEEKDAY_NAMES[k]
+        if group == "resource":
+            return by_id[k]["name"]
+        return k
+
+    def order(k):
+        # timer i åbningsrækkefølge (19, 20, ... 03), resten naturligt
+        return (k - ALLOWED_START_HOUR) % 24 if group == "hour" else k
+
+    def pct(c):
+        return round(100 * c["busy_minutes"] / c["capacity_minutes"], 1) if c["capacity_minutes"] else None
+
+    rows = [{"key": k, "label": label(k), **c, "occupancy_pct": pct(c)}
+            for k, c in sorted(cells.items(), key=lambda kv: order(kv[0]))]
+    total = {f: sum(r[f] for r in rows) for f in ("busy_minutes", "bookings", "capacity_minutes")}
+    return {"from": d0.isoformat(), "to": d1.isoformat(), "days": n_days, "group": group, "kind": kind,
+            "rows": rows, "total": {**total, "occupancy_pct": pct(total)}}
+
 @app.get("/api/bookings", response_model=List[BookingRead])
-def list_bookings(date: Optional[str] = None, db: Session = Depends(get_db)):
-    q = db.query(Booking)
-    q = q.filter(BOOKING_START_COL.isnot(None), BOOKING_END_COL.isnot(None))
-    if date:
-        d = datetime.strptime(date, "%Y-%m-%d").date()
-        start_day = datetime.combine(d, time_cls(0, 0))
-        end_day = start_day + timedelta(days=1)
-        q = q.filter(and_(BOOKING_START_COL >= start_day, BOOKING_START_COL < end_day))
-    rows = q.order_by(BOOKING_START_COL.asc()).all()
-
-    out: List[BookingRead] = []
-    for b in rows:
-        try:
-            s = getattr(b, BOOKING_START_COL.key)
-            e = getattr(b, BOOKING_END_COL.key)
-            out.append(
-                BookingRead(
-                    id=b.id,
-                    resource_id=b.resource_id,
-                    name=b.name,
-                    phone=b.phone,
-                    email=getattr(b, "email", None),
-                    start_iso_local=s.isoformat(),
-                    end_iso_local=e.isoformat(),
-                )
-            )
-        except Exception:
+async def list_bookings(request: Request, date: Optional[str] = None):
+    if not date:
+        body = await run_db(_bookings_rows, None, shape=_bookings_shape)
+        return Response(content=body, media_type="application/json")
+    d = datetime.strptime(date, "%Y-%m-%d").date()
+    return await _cached_json(request, ("bookings", d), versions.get(d),
+                              lambda db: _bookings_rows(db, d), _bookings_shape)
+
+def _bookings_json(db: Session, d) -> bytes:
+    return _bookings_shape(_bookings_rows(db, d))
+
+def _bookings_rows(db: Session, d) -> List[List[tuple]]:
+    # Kun de kolonner svaret bruger, som tupler i batches (yield_per) – ingen
+    # ORM-objekter, identity map eller BookingRead pr. række.
+    stmt = select(
+        Booking.id, Booking.resource_id, Booking.name, Booking.phone,
+        BOOKING_START_COL.label("s"), BOOKING_END_COL.label("e"),
+    ).where(BOOKING_START_COL.isnot(None), BOOKING_END_COL.isnot(None))
+    if d:
+        # lokal kalenderdag i UTC (23/25 timer ved sommertidsskift)
+        start_day, end_day = day_bounds(d)
+        stmt = stmt.where(BOOKING_START_COL >= start_day, BOOKING_START_COL < end_day)
+        cutoff = archive_cutoff()
+        if cutoff is not None and start_day < cutoff:
+            # dagen kan (delvist) være flyttet til bookings_archive
+            A = BookingArchive
+            stmt = union_all(stmt, select(
+                A.id, A.resource_id, A.name, A.phone, A.start_utc.label("s"), A.end_utc.label("e"),
+            ).where(A.start_utc >= start_day, A.start_utc < end_day)).subquery()
+            stmt = select(stmt).order_by(stmt.c.s.asc())
+        else:
+            stmt = stmt.order_by(BOOKING_START_COL.asc())
+    else:
+        stmt = stmt.order_by(BOOKING_START_COL.asc())
+    stmt = stmt.execution_options(yield_per=BOOKINGS_YIELD_PER)
+    return [list(batch) for batch in db.execute(stmt).partitions()]
+
+def _bookings_shape(batches: List[List[tuple]]) -> bytes:
+    # Hver batch serialiseres for sig, så hele dagen aldrig ligger som dicts på
+    # én gang. Formatet er det samme som BookingRead (email findes ikke i tabellen).
+    parts = []
+    for batch in batches:
+        rows = [
+            {"id": i, "resource_id": r, "name": n, "phone": p, "email": None,
+             "start_iso_local": local_iso(s), "end_iso_local": local_iso(e)}
+            for i, r, n, p, s, e in batch
+        ]
+        if rows:
+            parts.append(_dumps(rows)[1:-1])
+    return b"[" + b",".join(parts) + b"]"
+
+def _accepts_gzip(request: Request) -> bool:
+    for part in request.headers.get("accept-encoding", "").lower().split(","):
+        enc, _, q = part.partition(";")
+        if enc.strip() == "gzip":
+            q = q.replace(" ", "")
+            try:
+                return not q.startswith("q=") or float(q[2:]) > 0
+            except ValueError:
+                return False
+    return False
+
+@app.get("/api/bookings/export")
+async def export_bookings(
+    request: Request,
+    date_from: str = Query(..., alias="from"),
+    date_to: str = Query(..., alias="to"),
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    resource_id: Optional[List[int]] = Query(None),
+    kind: Optional[str] = Query(None, description="pool eller shuffle"),
+):
+    # Til bogføring/liga: hele perioder streamet (se app/core/export.py) i
+    # stedet for /api/bookings én dag ad gangen. Arkiverede bookinger er med.
+    if kind is not None and kind not in RESOURCE_KINDS:
+        raise HTTPException(422, "kind skal være pool eller shuffle")
+    try:
+        d0 = datetime.strptime(date_from, "%Y-%m-%d").date()
+        d1 = datetime.strptime(date_to, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(422, "from og to skal være datoer på formen ÅÅÅÅ-MM-DD")
+    if d1 < d0:
+        raise HTTPException(422, "to skal være samme dag eller efter from")
+    if (d1 - d0).days + 1 > MAX_EXPORT_DAYS:
+        raise HTTPException(422, f"Perioden må højst være {MAX_EXPORT_DAYS} dage")
+    res = await run_db(catalog.all)
+    rids = list(resource_id) if resource_id else None
+    if kind is not None:
+        rids = [r["id"] for r in res if r["kind"] == kind and (rids is None or r["id"] in rids)]
+    gz = _accepts_gzip(request)
+    headers = {
+        "Content-Disposition": f'attachment; filename="bookinger_{d0}_{d1}.{format}"',
+        "Cache-Control": "no-store",
+        "Vary": "Accept-Encoding",
+    }
+    if gz:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        export.stream(day_bounds(d0)[0], day_bounds(d1)[1], format, {r["id"]: r for r in res}, rids, gz),
+        media_type=export.FORMATS[format], headers=headers,
+    )
+
+def _rank_free(db: Session, kind: str, s_dt: datetime, e_dt: datetime) -> List[int]:
+    # Ledige borde af typen, bedst egnede først. Ét opslag henter dagens
+    # bookinger for alle bordene; for hvert ledigt bord måles hullerne før og
+    # efter den nye booking. Færrest nye huller vinder (læg den op ad en
+    # eksisterende booking), derefter mindst spild (best fit), så laveste id.
+    rids = [r["id"] for r in catalog.all(db) if r["kind"] == kind]
+    if not rids:
+        return []
+    open_dt, close_dt = _day_window(local_date(s_dt), True)
+    lo, hi = min(open_dt, s_dt), max(close_dt, e_dt)
+    prev_end = {rid: lo for rid in rids}
+    next_start = {rid: hi for rid in rids}
+    taken = set()
+    for rid, bs, be in _busy_rows(db, lo, hi, rids, with_holds=True):
+        if bs < e_dt and be > s_dt:
+            taken.add(rid)
+        elif be <= s_dt:
+            prev_end[rid] = max(prev_end[rid], be)
+        else:
+            next_start[rid] = min(next_start[rid], bs)
+    ranked = []
+    for rid in rids:
+        if rid in taken:
             continue
-    return out
+        before, after = s_dt - prev_end[rid], next_start[rid] - e_dt
+        ranked.append(((before > timedelta(0)) + (after > timedelta(0)), before + after, rid))
+    return [rid for *_, rid in sorted(ranked)]
+
+def _auto_assign(db: Session, kind: Optional[str], s_dt: datetime, e_dt: datetime, make) -> Booking:
+    # Prøv kandidaterne i rækkefølge; tager en anden bordet imellem opslag og
+    # insert (exclusion-constraint), går vi videre til det næste – og slår
+    # op igen hvis hele listen er brugt. Klienten ser kun 201 eller 409.
+    if kind not in RESOURCE_KINDS:
+        raise HTTPException(422, "Angiv resource_id eller kind (pool/shuffle)")
+    for _ in range(AUTO_ASSIGN_ROUNDS):
+        cands = _rank_free(db, kind, s_dt, e_dt)
+        if not cands:
+            break
+        for rid in cands:
+            if holds.blocked(db, rid, s_dt, e_dt):
+                db.rollback()
+                metrics.conflict("auto", "hold")
+                continue
+            b = make(rid)
+            db.add(b)
+            try:
+                db.commit()
+                return b
+            except IntegrityError as e:
+                db.rollback()
+                if not _is_overlap_violation(e):
+                    raise
+                metrics.conflict("auto", "constraint")
+    metrics.conflict("auto", "exhausted")
+    raise HTTPException(409, "Ingen ledige borde af den type på det tidspunkt")
 
 @app.post("/api/bookings", response_model=BookingRead, status_code=status.HTTP_201_CREATED)
-def create_booking(p: BookingCreate, background: BackgroundTasks, db: Session = Depends(get_db)):
+def create_booking(
+    p: BookingCreate,
+    background: BackgroundTasks,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    # Gentagelse med samme nøgle: gemt svar, ingen ny booking og ingen ny mail
+    return idempotency.run(db, idempotency_key, "POST /api/bookings", p, status.HTTP_201_CREATED,
+                           lambda: _create_booking(p, background, db), _dumps)
+
+def _booking_span(p: HoldCreate) -> Tuple[datetime, datetime]:
+    # Tidsrum + regler for varighed og åbningstid; fælles for booking og hold
     start_t = _parse_start(p)
     dur = int(p.duration or 60)
     s_dt, e_dt = _compose(p.date, start_t, dur)
@@ -280,62 +898,333 @@ def create_booking(p: BookingCreate, background: BackgroundTasks, db: Session =
             status_code=403,
             detail="Der kan kun bookes fredag og lørdag mellem kl. 19:00 og 23:00."
         )
+    return s_dt, e_dt
 
-
-    # konflikt
-    overlap = (
-        db.query(Booking)
-        .filter(Booking.resource_id == p.resource_id)
-        .filter(BOOKING_START_COL < e_dt)
-        .filter(BOOKING_END_COL > s_dt)
-        .all()
-    )
-    if overlap:
-        raise HTTPException(409, "Tidsrummet er ikke ledigt")
-
+def _create_booking(p: BookingCreate, background: BackgroundTasks, db: Session) -> BookingRead:
+    s_dt, e_dt = _booking_span(p)
     has_email_col = hasattr(Booking, "email")
-    b = Booking(
-        resource_id=p.resource_id,
-        name=p.name,
-        phone=p.phone,
-        **({"email": p.email} if has_email_col and p.email else {})
-    )
-    setattr(b, BOOKING_START_COL.key, s_dt)
-    setattr(b, BOOKING_END_COL.key, e_dt)
 
-    db.add(b)
-    db.commit()
+    def make(rid: int) -> Booking:
+        b = Booking(
+            resource_id=rid,
+            name=p.name,
+            phone=p.phone,
+            **({"email": p.email} if has_email_col and p.email else {})
+        )
+        setattr(b, BOOKING_START_COL.key, s_dt)
+        setattr(b, BOOKING_END_COL.key, e_dt)
+        return b
+
+    if p.resource_id is None:
+        b = _auto_assign(db, p.kind, s_dt, e_dt, make)
+    else:
+        # en gæst der er ved at udfylde formularen har tiden (låser bordet til commit)
+        if holds.blocked(db, p.resource_id, s_dt, e_dt):
+            metrics.conflict("create", "hold")
+            raise HTTPException(409, "Tidsrummet er holdt af en anden gæst lige nu – prøv igen om lidt")
+        # konflikt – håndhæves af ex_booking_no_overlap; ellers tjek selv
+        if not models.OVERLAP_GUARD and _has_overlap(db, p.resource_id, s_dt, e_dt):
+            metrics.conflict("create", "precheck")
+            raise HTTPException(409, "Tidsrummet er ikke ledigt")
+        b = make(p.resource_id)
+        db.add(b)
+        try:
+            db.commit()
+        except IntegrityError as e:
+            db.rollback()
+            if _is_overlap_violation(e):
+                metrics.conflict("create", "constraint")
+                raise HTTPException(409, "Tidsrummet er ikke ledigt")
+            raise
     db.refresh(b)
+    return _booking_created(p, b, s_dt, e_dt, background, db)
 
-    if MAIL_ENABLED and p.email:
+def _booking_created(p: BookingCreate, b: Booking, s_dt: datetime, e_dt: datetime,
+                     background: BackgroundTasks, db: Session) -> BookingRead:
+    # Efter commit: bekræftelsesmail, svar og SSE/cache
+    has_email_col = hasattr(Booking, "email")
+    m = _mail() if p.email else None
+    if m is not None:
         try:
-            mail = BookingEmailData(
+            mail = m.BookingEmailData(
                 to=p.email, name=p.name, booking_id=str(b.id), date=p.date,
-                start=s_dt.strftime("%H:%M"), end=e_dt.strftime("%H:%M"),
-                table=_resource_name(db, p.resource_id),
+                start=to_local(s_dt).strftime("%H:%M"), end=to_local(e_dt).strftime("%H:%M"),
+                table=_resource_name(db, b.resource_id),
                 people=int(getattr(b, "people", 1)), phone=p.phone
             )
-            background.add_task(send_booking_confirmation, mail)
+            # i kø hos dispatcheren; ellers som før via BackgroundTasks
+            if not m.dispatcher.submit(mail):
+                background.add_task(m.send_booking_confirmation, mail)
         except Exception:
             pass
 
-    return BookingRead(
+    out = BookingRead(
         id=b.id,
         resource_id=b.resource_id,
         name=b.name,
         phone=b.phone,
         email=(b.email if has_email_col else p.email),
-        start_iso_local=s_dt.isoformat(),
-        end_iso_local=e_dt.isoformat(),
+        start_iso_local=local_iso(s_dt),
+        end_iso_local=local_iso(e_dt),
     )
+    _announce(db, s_dt, e_dt, "booking.created", {"date": local_date(s_dt).isoformat(), "booking": _booking_event(out)})
+    return out
+
+# ---------- hold-and-confirm (app/core/holds.py) ----------
+def _touch_holds(db: Session, spans) -> None:
+    # Hold ændrer kun availability: ugyldiggør datoerne her og i de andre
+    # workers, men ingen SSE – staff-tavlen viser bookinger
+    dates = set()
+    for s_dt, e_dt in spans:
+        dates.update(_touch_dates(s_dt, e_dt))
+    bus.notify(db, dates)
+
+def _holds_expired(spans) -> None:
+    with app_db.SessionLocal() as db:
+        _touch_holds(db, spans)
+
+@app.post("/api/holds", response_model=HoldRead, status_code=status.HTTP_201_CREATED)
+def create_hold(
+    p: HoldCreate,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    # Et nyt forsøg efter netværksfejl må ikke ende i 409 mod sit eget hold
+    return idempotency.run(db, idempotency_key, "POST /api/holds", p, status.HTTP_201_CREATED,
+                           lambda: _create_hold(p, db), _dumps)
+
+def _create_hold(p: HoldCreate, db: Session) -> HoldRead:
+    s_dt, e_dt = _booking_span(p)
+    if p.resource_id is not None:
+        if catalog.get(db, p.resource_id) is None:
+            raise HTTPException(404, "Bord findes ikke")
+        h = holds.place(db, p.resource_id, s_dt, e_dt)
+    elif p.kind in RESOURCE_KINDS:
+        h = None
+        for rid in _rank_free(db, p.kind, s_dt, e_dt):
+            h = holds.place(db, rid, s_dt, e_dt)
+            if h is not None:
+                break
+    else:
+        raise HTTPException(422, "Angiv resource_id eller kind (pool/shuffle)")
+    if h is None:
+        raise HTTPException(409, "Tidsrummet er ikke ledigt")
+    out = HoldRead(
+        id=h.id, resource_id=h.resource_id,
+        start_iso_local=local_iso(s_dt), end_iso_local=local_iso(e_dt),
+        expires_iso_local=local_iso(h.expires_at),
+        ttl_seconds=int((h.expires_at - h.created_at).total_seconds()),
+    )
+    _touch_holds(db, [(s_dt, e_dt)])
+    return out
+
+@app.post("/api/holds/{hold_id}/confirm", response_model=BookingRead, status_code=status.HTTP_201_CREATED)
+def confirm_hold(
+    hold_id: str,
+    p: HoldConfirm,
+    background: BackgroundTasks,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    return idempotency.run(db, idempotency_key, f"POST /api/holds/{hold_id}/confirm", p,
+                           status.HTTP_201_CREATED, lambda: _confirm_hold(hold_id, p, background, db), _dumps)
+
+def _confirm_hold(hold_id: str, p: HoldConfirm, background: BackgroundTasks, db: Session) -> BookingRead:
+    # Holdet bliver til en booking i samme transaktion som det slettes
+    h = holds.take(db, hold_id)
+    rid, s_dt, e_dt = h.resource_id, h.start_utc, h.end_utc
+    if not models.OVERLAP_GUARD and _has_overlap(db, rid, s_dt, e_dt):
+        # fx en staff-batch der er gået uden om holdet
+        db.delete(h)
+        db.commit()
+        metrics.conflict("confirm", "precheck")
+        raise HTTPException(409, "Tidsrummet er ikke ledigt")
+    b = Booking(
+        resource_id=rid, name=p.name, phone=p.phone,
+        **({"email": p.email} if hasattr(Booking, "email") and p.email else {})
+    )
+    setattr(b, BOOKING_START_COL.key, s_dt)
+    setattr(b, BOOKING_END_COL.key, e_dt)
+    db.add(b)
+    db.delete(h)
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if _is_overlap_violation(e):
+            # rollback bragte holdet tilbage – fjern det som i precheck-grenen
+            db.delete(h)
+            db.commit()
+            metrics.conflict("confirm", "constraint")
+            raise HTTPException(409, "Tidsrummet er ikke ledigt")
+        raise
+    holds.confirmed += 1
+    db.refresh(b)
+    bp = BookingCreate(
+        resource_id=rid, date=local_date(s_dt).isoformat(), start_time=to_local(s_dt).strftime("%H:%M"),
+        duration=int((e_dt - s_dt).total_seconds() // 60), name=p.name, phone=p.phone, email=p.email,
+    )
+    return _booking_created(bp, b, s_dt, e_dt, background, db)
+
+@app.delete("/api/holds/{hold_id}", status_code=status.HTTP_204_NO_CONTENT)
+def release_hold(hold_id: str, db: Session = Depends(get_db)):
+    # Gæsten valgte en anden tid eller forlod siden; ukendt id er også 204
+    span = holds.release(db, hold_id)
+    if span is not None:
+        _touch_holds(db, [span])
+    return None
+
+def _expand_batch(p: BookingBatch) -> List[BookingBatchItem]:
+    items = list(p.items)
+    r = p.recurrence
+    if r:
+        if not (1 <= r.weeks <= 52):
+            raise HTTPException(422, "weeks skal være 1-52")
+        d0 = datetime.strptime(r.start_date, "%Y-%m-%d").date()
+        days = set(r.weekdays if r.weekdays is not None else [d0.weekday()])
+        for k in range(r.weeks * 7):
+            d = d0 + timedelta(days=k)
+            if d.weekday() not in days:
+                continue
+            for rid in r.resource_ids:
+                items.append(BookingBatchItem(
+                    resource_id=rid, date=d.isoformat(), start_time=r.start_time,
+                    duration=r.duration, name=r.name, phone=r.phone,
+                ))
+    if not items:
+        raise HTTPException(422, "Angiv items eller recurrence")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(422, f"Højst {MAX_BATCH_ITEMS} bookinger pr. batch")
+    return items
+
+def _batch_conflicts(db: Session, cands: List[Tuple[int, int, datetime, datetime]]) -> Dict[int, int]:
+    # Ét sæt-baseret opslag: kandidaterne som VALUES joinet mod bookings på
+    # samme bord med overlappende [start, slut). Giver {idx: eksisterende booking-id}.
+    if not cands:
+        return {}
+    rows, params = [], []
+    for n, (idx, rid, s_dt, e_dt) in enumerate(cands):
+        rows.append(f"(:i{n}, :r{n}, :s{n}, :e{n})")
+        params += [
+            bindparam(f"i{n}", idx, type_=Integer), bindparam(f"r{n}", rid, type_=Integer),
+            bindparam(f"s{n}", s_dt, type_=UTCDateTime()),
+            bindparam(f"e{n}", e_dt, type_=UTCDateTime()),
+        ]
+    sc, ec = BOOKING_START_COL.name, BOOKING_END_COL.name
+    stmt = text(
+        f"WITH v(idx, rid, s, e) AS (VALUES {', '.join(rows)}) "
+        f"SELECT v.idx, b.id FROM v JOIN bookings b "
+        f"ON b.resource_id = v.rid AND b.{sc} < v.e AND b.{ec} > v.s"
+    ).bindparams(*params)
+    out: Dict[int, int] = {}
+    for idx, bid in db.execute(stmt):
+        out.setdefault(idx, bid)
+    return out
+
+@app.post("/api/bookings/batch")
+def create_bookings_batch(p: BookingBatch, db: Session = Depends(get_db)):
+    # Staff: mange bookinger på én gang (ligaer, turneringer). Staff-regler –
+    # intet åbningsvindue, mindst 30 min – og ingen bekræftelsesmails.
+    items = _expand_batch(p)
+    results: List[Dict] = [{"index": i, "status": "pending"} for i in range(len(items))]
+    cands: List[Tuple[int, int, datetime, datetime]] = []
+    for i, it in enumerate(items):
+        res = results[i]
+        try:
+            start_t = datetime.strptime(it.start_time, "%H:%M").time()
+            s_dt, e_dt = _compose(it.date, start_t, int(it.duration))
+        except ValueError:
+            res.update(status="invalid", detail="Ugyldig dato eller tid")
+            continue
+        except HTTPException as e:   # fx et klokkeslæt der ikke findes (sommertid)
+            res.update(status="invalid", detail=e.detail)
+            continue
+        res.update(resource_id=it.resource_id, start_iso_local=local_iso(s_dt), end_iso_local=local_iso(e_dt))
+        if it.duration < 30:
+            res.update(status="invalid", detail="Varigheden skal være mindst 30 minutter.")
+        elif catalog.get(db, it.resource_id) is None:
+            res.update(status="invalid", detail="Ukendt bord")
+        else:
+            cands.append((i, it.resource_id, s_dt, e_dt))
+
+    # Overlap inden for selve batchen: sortér pr. bord og sammenlign med forrige
+    cands.sort(key=lambda c: (c[1], c[2]))
+    ok: List[Tuple[int, int, datetime, datetime]] = []
+    for c in cands:
+        if ok and ok[-1][1] == c[1] and c[2] < ok[-1][3]:
+            results[c[0]].update(status="conflict", detail=f"Overlapper punkt {ok[-1][0]} i batchen")
+        else:
+            ok.append(c)
+
+    for attempt in range(2):
+        clash = _batch_conflicts(db, ok)
+        for idx, bid in clash.items():
+            metrics.conflict("batch", "precheck")
+            results[idx].update(status="conflict", detail="Tidsrummet er ikke ledigt", conflicts_with=bid)
+        ok = [c for c in ok if c[0] not in clash]
+        failed = any(r["status"] in ("invalid", "conflict") for r in results)
+        if (p.mode == "all" and failed) or not ok:
+            break
+        rows = [{
+            "resource_id": rid, "name": items[idx].name, "phone": items[idx].phone,
+            BOOKING_START_COL.key: s_dt, BOOKING_END_COL.key: e_dt,
+        } for idx, rid, s_dt, e_dt in ok]
+        try:
+            ids = db.execute(
+                insert(Booking).returning(Booking.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+            # bulk-INSERT går uden om mapper-events – opdatér belægningen selv
+            rollup.apply(db.connection(), [(rid, s_dt, e_dt, 1) for _, rid, s_dt, e_dt in ok])
+            db.commit()
+        except IntegrityError as e:
+            # en anden nåede at booke imellem tjek og insert – tjek igen én gang
+            db.rollback()
+            if not _is_overlap_violation(e) or attempt:
+                if _is_overlap_violation(e):
+                    metrics.conflict("batch", "constraint")
+                    raise HTTPException(409, "Tidsrummet er ikke ledigt – prøv igen")
+                raise
+            continue
+        for (idx, *_), bid in zip(ok, ids):
+            results[idx].update(status="created", id=bid)
+        break
+
+    created = [c for c in ok if results[c[0]]["status"] == "created"]
+    if not created:
+        for r in results:
+            if r["status"] == "pending":
+                r.update(status="skipped", detail="Batchen blev afvist (mode=all)")
+    if created:
+        dates = set()
+        for _, _, s_dt, e_dt in created:
+            dates.update(_touch_dates(s_dt, e_dt))
+        event = {"dates": sorted(d.isoformat() for d in dates), "count": len(created)}
+        hub.publish("booking.batch", event)
+        bus.notify(db, dates, "booking.batch", event)
+
+    body = {
+        "mode": p.mode,
+        "created": len(created),
+        "failed": sum(1 for r in results if r["status"] in ("invalid", "conflict")),
+        "results": results,
+    }
+    if not created:
+        return JSONResponse(body, status_code=409)
+    return JSONResponse(body, status_code=201 if len(created) == len(items) else 207)
 
 @app.put("/api/bookings/{booking_id}", response_model=BookingRead)
 def extend_booking(
     booking_id: int,
     p: BookingExtend,
     staff: bool = Query(False),           # NYT
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
+    # end-alert.js prøver igen ved netværksfejl – uden nøgle ville hvert forsøg forlænge igen
+    return idempotency.run(db, idempotency_key, f"PUT /api/bookings/{booking_id}?staff={staff}", p,
+                           status.HTTP_200_OK, lambda: _extend_booking(booking_id, p, staff, db), _dumps)
+
+def _extend_booking(booking_id: int, p: BookingExtend, staff: bool, db: Session) -> BookingRead:
     b = db.query(Booking).filter(Booking.id == booking_id).first()
     if not b:
         raise HTTPException(404, "Booking ikke fundet")
@@ -343,6 +1232,9 @@ def extend_booking(
     cur_end = getattr(b, BOOKING_END_COL.key)
     new_end = cur_end + timedelta(minutes=int(p.add_minutes))
     start_dt = getattr(b, BOOKING_START_COL.key)
+    if new_end <= start_dt:
+        # ellers fejler tstzrange i constraint'en først ved commit (500)
+        raise HTTPException(422, "Forlængelsen ville give en booking uden varighed")
 
     # NYT: kun afvise hvis ikke staff
     if (not staff) and (not _is_within_allowed_window(start_dt, new_end)):
@@ -351,34 +1243,77 @@ def extend_booking(
             detail="Forlængelse afvises: Kun fredag/lørdag kl. 19:00–23:00."
         )
 
-    overlap = (
-        db.query(Booking)
-        .filter(Booking.resource_id == b.resource_id, Booking.id != b.id)
-        .filter(BOOKING_START_COL < new_end, BOOKING_END_COL > getattr(b, BOOKING_START_COL.key))
-        .all()
-    )
-    
-    if overlap:
+    if new_end > cur_end and holds.blocked(db, b.resource_id, cur_end, new_end):
+        metrics.conflict("extend", "hold")
+        raise HTTPException(409, "Kan ikke forlænge – tiden er holdt af en gæst der er ved at booke")
+
+    if not models.OVERLAP_GUARD and _has_overlap(db, b.resource_id, start_dt, new_end, exclude_id=b.id):
+        metrics.conflict("extend", "precheck")
         raise HTTPException(409, "Kan ikke forlænge – konflikt")
 
     setattr(b, BOOKING_END_COL.key, new_end)
-    db.add(b); db.commit(); db.refresh(b)
+    db.add(b)
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if _is_overlap_violation(e):
+            metrics.conflict("extend", "constraint")
+            raise HTTPException(409, "Kan ikke forlænge – konflikt")
+        raise
+    db.refresh(b)
 
-    return BookingRead(
+    out = BookingRead(
         id=b.id, resource_id=b.resource_id, name=b.name, phone=b.phone,
         email=getattr(b, "email", None),
-        start_iso_local=getattr(b, BOOKING_START_COL.key).isoformat(),
-        end_iso_local=getattr(b, BOOKING_END_COL.key).isoformat(),
+        start_iso_local=local_iso(getattr(b, BOOKING_START_COL.key)),
+        end_iso_local=local_iso(getattr(b, BOOKING_END_COL.key)),
     )
+    _announce(db, getattr(b, BOOKING_START_COL.key), max(cur_end, new_end), "booking.extended", {
+        "date": local_date(getattr(b, BOOKING_START_COL.key)).isoformat(),
+        "booking": _booking_event(out),
+    })
+    return out
 
 @app.delete("/api/bookings/{booking_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_booking(booking_id: int, db: Session = Depends(get_db)):
     b = db.query(Booking).filter(Booking.id == booking_id).first()
     if not b:
         raise HTTPException(404, "Booking ikke fundet")
+    event = {
+        "id": b.id,
+        "resource_id": b.resource_id,
+        "date": local_date(getattr(b, BOOKING_START_COL.key)).isoformat(),
+    }
+    s_dt, e_dt = getattr(b, BOOKING_START_COL.key), getattr(b, BOOKING_END_COL.key)
     db.delete(b); db.commit()
+    _announce(db, s_dt, e_dt, "booking.deleted", event)
     return None
 
+@app.get("/api/stream", include_in_schema=False)
+async def stream(request: Request):
+    # Server-Sent Events: booking-deltas til staff-tavlen (se app/core/events.py)
+    q = hub.subscribe()
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    evt = await asyncio.wait_for(q.get(), STREAM_PING_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield f"id: {evt['seq']}\nevent: {evt['type']}\ndata: {json.dumps(evt)}\n\n"
+        finally:
+            hub.unsubscribe(q)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # ---------- HTML fallback (skader ikke Caddy) ----------
 @app.get("/", include_in_schema=False)
 def public_home():
@@ -398,26 +1333,27 @@ def test_email(
     to: EmailStr = Query(..., description="Modtagerens adresse"),
     background: BackgroundTasks = None
 ):
-    # kræver at app.core.email er importeret som i din fil:
-    # from app.core.email import send_booking_confirmation, BookingEmailData
-    if not MAIL_ENABLED:
+    m = _mail()
+    if m is None:
         raise HTTPException(status_code=500, detail="Mail-modulet er ikke aktivt")
 
-    data = BookingEmailData(
+    data = m.BookingEmailData(
         to=str(to),
         name="Test",
         booking_id="TEST",
-        date=datetime.now().strftime("%Y-%m-%d"),
+        date=datetime.now(LOCAL_TZ).strftime("%Y-%m-%d"),
         start="19:00",
         end="20:00",
         table="Testbord",
         people=1,
         phone=None,
     )
+    if m.dispatcher.submit(data):
+        return {"ok": True, "queued": True}
     if background:
-        background.add_task(send_booking_confirmation, data)
+        background.add_task(m.send_booking_confirmation, data)
         return {"ok": True, "queued": True}
-    send_booking_confirmation(data)
+    m.send_booking_confirmation(data)
     return {"ok": True}
 
 
@@ -1,24 +1,44 @@
 from __future__ import annotations
 import os
+import time
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from sqlalchemy import (
-    Column, Integer, String, DateTime, ForeignKey, create_engine, Index
+    Column, Integer, String, Text, DateTime, ForeignKey, Index, insert, select, text
 )
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.types import TypeDecorator
 
-DB_URL = os.environ.get("DB_URL", "postgresql+psycopg://booking:booking@db:5432/booking")
-connect_args = {"check_same_thread": False} if DB_URL.startswith("sqlite:") else {}
+from app.db import SessionLocal, get_engine
 
-engine = create_engine(DB_URL, connect_args=connect_args, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 Base = declarative_base()
 
+class UTCDateTime(TypeDecorator):
+    """timestamptz der altid er aware UTC i Python (se app/core/tz.py).
+
+    SQLite gemmer ikke offset, så dér lagres naiv UTC; naive værdier ind og ud
+    tolkes som UTC.
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        value = value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+        return value if dialect.name == "postgresql" else value.replace(tzinfo=None)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
 class Resource(Base):
     __tablename__ = "resources"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), unique=True, nullable=False)
     kind = Column(String(20), nullable=False)  # 'pool' eller 'shuffle'
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    created_at = Column(UTCDateTime(), default=lambda: datetime.now(timezone.utc))
 
     bookings = relationship("Booking", back_populates="resource", cascade="all, delete-orphan")
 
@@ -26,73 +46,281 @@ class Booking(Base):
     __tablename__ = "bookings"
     id = Column(Integer, primary_key=True, index=True)
     resource_id = Column(Integer, ForeignKey("resources.id", ondelete="CASCADE"), nullable=False)
-    start_utc = Column(DateTime(timezone=True), nullable=False)
-    end_utc = Column(DateTime(timezone=True), nullable=False)
+    start_utc = Column(UTCDateTime(), nullable=False)
+    end_utc = Column(UTCDateTime(), nullable=False)
     name = Column(String(120), nullable=False)
     phone = Column(String(50), nullable=True)
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    created_at = Column(UTCDateTime(), default=lambda: datetime.now(timezone.utc))
 
     resource = relationship("Resource", back_populates="bookings")
 
+class BookingArchive(Base):
+    # Afviklede bookinger flyttes hertil af app/core/archive.py (samme id)
+    __tablename__ = "bookings_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    resource_id = Column(Integer, nullable=False)
+    start_utc = Column(UTCDateTime(), nullable=False)
+    end_utc = Column(UTCDateTime(), nullable=False)
+    name = Column(String(120), nullable=False)
+    phone = Column(String(50), nullable=True)
+    created_at = Column(UTCDateTime(), nullable=True)
+    archived_at = Column(UTCDateTime(), server_default=text("CURRENT_TIMESTAMP"))
+
+class OccupancyHourly(Base):
+    # Belægning pr. bord og (UTC-)time, vedligeholdt af app/core/rollup.py.
+    # Rapporterne læser kun denne tabel – aldrig bookings.
+    __tablename__ = "occupancy_hourly"
+    resource_id = Column(Integer, primary_key=True)
+    hour_utc = Column(UTCDateTime(), primary_key=True)
+    busy_minutes = Column(Integer, nullable=False, default=0)
+    bookings = Column(Integer, nullable=False, default=0)   # bookinger der starter i timen
+
+class IdempotencyKey(Base):
+    # Idempotency-Key -> gemt svar (se app/core/idempotency.py); status_code er
+    # NULL mens den første request stadig kører
+    __tablename__ = "idempotency_keys"
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    status_code = Column(Integer, nullable=True)
+    body = Column(Text, nullable=True)
+    created_at = Column(UTCDateTime(), nullable=False)
+
+class SlotHold(Base):
+    # Kortvarigt hold på et tidsrum mens gæsten udfylder formularen (se
+    # app/core/holds.py); id er en tilfældig token som kun holderen kender
+    __tablename__ = "slot_holds"
+    id = Column(String(32), primary_key=True)
+    resource_id = Column(Integer, nullable=False)
+    start_utc = Column(UTCDateTime(), nullable=False)
+    end_utc = Column(UTCDateTime(), nullable=False)
+    expires_at = Column(UTCDateTime(), nullable=False)
+    created_at = Column(UTCDateTime(), nullable=False)
+
+class SchemaMigration(Base):
+    # Ét rækkenummer pr. migrationstrin i MIGRATIONS nedenfor der er kørt
+    __tablename__ = "schema_migrations"
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(100), nullable=False)
+    applied_at = Column(UTCDateTime(), server_default=text("CURRENT_TIMESTAMP"))
+
+# Navn på exclusion-constraint der forhindrer overlap pr. bord (kun Postgres)
+OVERLAP_CONSTRAINT = "ex_booking_no_overlap"
+# Sættes af init_db() når constraint'en er på plads – så kan ruterne
+# springe forespørgslen om overlap over og stole på databasen
+OVERLAP_GUARD = False
+
 # Indekser for hurtige overlap-søgninger
 Index("ix_booking_res_start", Booking.resource_id, Booking.start_utc)
 Index("ix_booking_res_end", Booking.resource_id, Booking.end_utc)
+# Dagsforespørgslen filtrerer kun på start_utc; på Postgres dækker INCLUDE
+# resten af kolonnerne i /api/bookings, så den kan blive en index-only scan
+Index(
+    "ix_booking_start_cover", Booking.start_utc,
+    postgresql_include=["end_utc", "resource_id", "name", "phone", "id"],
+)
+Index("ix_booking_archive_start", BookingArchive.start_utc)
+Index("ix_idempotency_created", IdempotencyKey.created_at)
+Index("ix_occupancy_hour", OccupancyHourly.hour_utc)
+Index("ix_slot_hold_res_start", SlotHold.resource_id, SlotHold.start_utc)
+Index("ix_slot_hold_expires", SlotHold.expires_at)
+
+# Nøgle til pg_advisory_lock under init_db (vilkårlig, men fast)
+INIT_LOCK_KEY = 7_310_411
+
+@contextmanager
+def _init_lock(engine):
+    # Med flere workers kører init_db i hver proces samtidig; kun én ad gangen
+    # må oprette tabeller, migrere og seede – de næste ser så at alt er på plads
+    if engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+        # ingen advisory locks i SQLite – en fil-lås ved siden af databasen
+        import fcntl
+        with open(engine.url.database + ".init-lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": INIT_LOCK_KEY})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": INIT_LOCK_KEY})
+            conn.commit()
 
 def init_db():
-    # Opret tabeller hvis de mangler
-    Base.metadata.create_all(bind=engine)
+    """Bringer skemaet ajour og seeder borde – normalt med én forespørgsel.
 
-    # Defensiv migration – tilføj manglende kolonner + indexes uden at slette data
-    MIGRATION_SQL = """
-    DO $$
-    BEGIN
-      IF NOT EXISTS (
-        SELECT 1 FROM information_schema.columns
-        WHERE table_name='resources' AND column_name='kind'
-      ) THEN
-        ALTER TABLE resources ADD COLUMN kind VARCHAR(20) NOT NULL DEFAULT 'pool';
-      END IF;
-
-      IF NOT EXISTS (
-        SELECT 1 FROM information_schema.columns
-        WHERE table_name='resources' AND column_name='created_at'
-      ) THEN
-        ALTER TABLE resources ADD COLUMN created_at TIMESTAMPTZ DEFAULT now();
-      END IF;
-
-      IF NOT EXISTS (
-        SELECT 1 FROM information_schema.columns
-        WHERE table_name='bookings' AND column_name='phone'
-      ) THEN
-        ALTER TABLE bookings ADD COLUMN phone VARCHAR(50);
-      END IF;
-
-      IF NOT EXISTS (
-        SELECT 1 FROM information_schema.columns
-        WHERE table_name='bookings' AND column_name='created_at'
-      ) THEN
-        ALTER TABLE bookings ADD COLUMN created_at TIMESTAMPTZ DEFAULT now();
-      END IF;
-    END $$;
-
-    CREATE INDEX IF NOT EXISTS ix_booking_res_start ON bookings (resource_id, start_utc);
-    CREATE INDEX IF NOT EXISTS ix_booking_res_end   ON bookings (resource_id, end_utc);
+    Boot læser schema-version, overlap-constraint og om der findes borde i én
+    forespørgsel. Kun hvis noget mangler tages init-låsen og MIGRATIONS køres –
+    på Postgres også når constraint'en mangler, så trinnet prøves igen.
+    OVERLAP_GUARD sættes ud fra om constraint'en faktisk findes.
     """
+    global OVERLAP_GUARD
+    engine = get_engine()
+    state = _boot_state(engine)
+    missing_guard = engine.dialect.name == "postgresql" and not state[1]
+    if state[0] < SCHEMA_VERSION or not state[2] or missing_guard:
+        with _init_lock(engine):
+            _migrate(engine)
+            _seed()
+        state = _boot_state(engine)
+    OVERLAP_GUARD = bool(state[1])
+
+def _boot_state(engine):
+    """(schema-version, overlap-constraint findes, der findes borde) – 0/False hvis tom database."""
+    if engine.dialect.name == "postgresql":
+        sql = ("SELECT (SELECT max(version) FROM schema_migrations),"
+               " EXISTS (SELECT 1 FROM pg_constraint WHERE conname = :n),"
+               " EXISTS (SELECT 1 FROM resources)")
+    else:
+        sql = "SELECT (SELECT max(version) FROM schema_migrations), 0, EXISTS (SELECT 1 FROM resources)"
+    try:
+        with engine.connect() as conn:
+            version, guard, seeded = conn.execute(text(sql), {"n": OVERLAP_CONSTRAINT}).one()
+    except Exception:
+        # tabellerne findes ikke endnu
+        return 0, False, False
+    return version or 0, bool(guard), bool(seeded)
+
+# Defensiv migration – tilføj manglende kolonner + indexes uden at slette data.
+# Fra før schema_migrations; idempotent, så den kan køre på enhver gammel database.
+MIGRATION_SQL = """
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_name='resources' AND column_name='kind'
+  ) THEN
+    ALTER TABLE resources ADD COLUMN kind VARCHAR(20) NOT NULL DEFAULT 'pool';
+  END IF;
+
+  IF NOT EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_name='resources' AND column_name='created_at'
+  ) THEN
+    ALTER TABLE resources ADD COLUMN created_at TIMESTAMPTZ DEFAULT now();
+  END IF;
+
+  IF NOT EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_name='bookings' AND column_name='phone'
+  ) THEN
+    ALTER TABLE bookings ADD COLUMN phone VARCHAR(50);
+  END IF;
+
+  IF NOT EXISTS (
+    SELECT 1 FROM information_schema.columns
+    WHERE table_name='bookings' AND column_name='created_at'
+  ) THEN
+    ALTER TABLE bookings ADD COLUMN created_at TIMESTAMPTZ DEFAULT now();
+  END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS ix_booking_res_start ON bookings (resource_id, start_utc);
+CREATE INDEX IF NOT EXISTS ix_booking_res_end   ON bookings (resource_id, end_utc);
+CREATE INDEX IF NOT EXISTS ix_booking_archive_start ON bookings_archive (start_utc);
+CREATE INDEX IF NOT EXISTS ix_booking_start_cover ON bookings (start_utc)
+  INCLUDE (end_utc, resource_id, name, phone, id);
+"""
+
+# Overlap håndhæves af databasen: samme bord må ikke have to bookinger
+# hvis [start, slut) overlapper. Kræver btree_gist for '=' på resource_id.
+# Findes der allerede overlap i data, springes constraint'en over (NOTICE)
+# og ruterne falder tilbage til at tjekke overlap selv.
+OVERLAP_SQL = f"""
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_constraint WHERE conname = '{OVERLAP_CONSTRAINT}'
+  ) THEN
+    BEGIN
+      ALTER TABLE bookings ADD CONSTRAINT {OVERLAP_CONSTRAINT}
+        EXCLUDE USING gist (
+          resource_id WITH =,
+          tstzrange(start_utc, end_utc, '[)') WITH &&
+        );
+    EXCEPTION WHEN exclusion_violation THEN
+      RAISE NOTICE 'bookings indeholder overlap – {OVERLAP_CONSTRAINT} ikke oprettet';
+    END;
+  END IF;
+END $$;
+"""
+
+
+def _m_baseline(engine):
+    Base.metadata.create_all(bind=engine)
+    # DO $$-blokken er Postgres-specifik (SQLite bruges kun lokalt/bench)
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.exec_driver_sql(MIGRATION_SQL)
+
+def _m_overlap(engine):
+    if engine.dialect.name != "postgresql":
+        return True
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(OVERLAP_SQL)
+    except Exception as e:
+        # fx hvis btree_gist ikke er installeret på serveren; ruterne tjekker selv
+        print(f"[db] Kunne ikke oprette {OVERLAP_CONSTRAINT}: {getattr(e, 'orig', e)}")
+    # også False hvis data havde overlap (NOTICE) – trinnet prøves igen ved næste boot
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = :n)"),
+                            {"n": OVERLAP_CONSTRAINT}).scalar()
+
+def _m_occupancy(engine):
+    # occupancy_hourly kom til efter at der fandtes bookinger
+    from app.core import rollup
+    print(f"[db] occupancy_hourly: {rollup.backfill()}")
+
+def _m_slot_holds(engine):
+    SlotHold.__table__.create(bind=engine, checkfirst=True)
+
+# Kører i rækkefølge, hvert trin én gang pr. database. Nye tabeller, kolonner
+# og indekser lægges som et nyt trin sidst – eksisterende trin ændres ikke.
+# Et trin der returnerer False blev ikke gennemført; det registreres ikke og
+# køres igen næste gang.
+MIGRATIONS = [
+    (1, "baseline", _m_baseline),
+    (2, "overlap_constraint", _m_overlap),
+    (3, "occupancy_backfill", _m_occupancy),
+    (4, "slot_holds", _m_slot_holds),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
 
-    with engine.begin() as conn:
-        conn.exec_driver_sql(MIGRATION_SQL)
+def _migrate(engine):
+    SchemaMigration.__table__.create(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        done = set(conn.execute(select(SchemaMigration.version)).scalars())
+    for version, name, step in MIGRATIONS:
+        if version in done:
+            continue
+        t0 = time.perf_counter()
+        if step(engine) is False:
+            print(f"[db] schema v{version} {name} ikke gennemført – prøves igen ved næste boot")
+            continue
+        with engine.begin() as conn:
+            conn.execute(insert(SchemaMigration), {"version": version, "name": name})
+        print(f"[db] schema v{version} {name} ({time.perf_counter() - t0:.2f} s)")
 
-    # Seed resources hvis tomt (uændret fra før)
+def _seed():
+    # Seed resources hvis tomt (antal styres af POOL_COUNT/SHUFFLE_COUNT)
     db = SessionLocal()
     try:
         if db.query(Resource).count() == 0:
-            db.add_all([
-                Resource(name="Pool 1", kind="pool"),
-                Resource(name="Pool 2", kind="pool"),
-                Resource(name="Pool 3", kind="pool"),
-                Resource(name="Shuffle 1", kind="shuffle"),
-                Resource(name="Shuffle 2", kind="shuffle"),
-            ])
+            pool_n = int(os.getenv("POOL_COUNT", "3"))
+            shuffle_n = int(os.getenv("SHUFFLE_COUNT", "2"))
+            db.add_all(
+                [Resource(name=f"Pool {i}", kind="pool") for i in range(1, pool_n + 1)]
+                + [Resource(name=f"Shuffle {i}", kind="shuffle") for i in range(1, shuffle_n + 1)]
+            )
             db.commit()
     finally:
         db.close()
@@ -0,0 +1,102 @@
+"""Dagsforespørgsler med og uden arkivering ved 1M+ historiske bookinger.
+
+Seeder N gamle bookinger (default 1.000.000 fordelt over 5 år) plus en
+almindelig kommende fredag, måler payload-bygningen for /api/bookings og
+/api/availability på fredagen, kører arkiveringsjobbet og måler igen.
+På Postgres vises også tabel- og indeksstørrelse før og efter.
+
+    python bench/bench_archive.py [antal] [gentagelser]
+    BENCH_DB_URL=postgresql+psycopg://... python bench/bench_archive.py
+"""
+from __future__ import annotations
+
+import sys
+import time
+from datetime import date, time as dtime, timedelta
+
+from _common import measure, report, setup_env
+
+setup_env("archive")
+
+from sqlalchemy import func, insert, select, text  # noqa: E402
+
+from app import main as app_main  # noqa: E402
+from app.core.archive import archive_old_bookings  # noqa: E402
+from app.core.tz import local_to_utc  # noqa: E402
+from app.db import SessionLocal, get_engine  # noqa: E402
+from app.models import Booking, init_db  # noqa: E402
+
+CHUNK = 50_000
+
+
+def upcoming_friday() -> date:
+    d = date.today() + timedelta(days=7)
+    return d + timedelta(days=(4 - d.weekday()) % 7)
+
+
+def seed(n: int, day: date) -> None:
+    engine = get_engine()
+    first = local_to_utc(date.today() - timedelta(days=5 * 365), dtime(0, 0))
+    span = 5 * 365 - 120   # alt historisk ligger klart før arkiv-grænsen
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        for off in range(0, n, CHUNK):
+            rows = []
+            for i in range(off, min(n, off + CHUNK)):
+                s = first + timedelta(days=i % span, hours=19 + (i // span) % 8)
+                rows.append({"resource_id": 1 + i % 5, "start_utc": s, "end_utc": s + timedelta(hours=1),
+                             "name": f"Gæst {i}", "phone": None})
+            conn.execute(insert(Booking), rows)
+        s = local_to_utc(day, dtime(19, 0))
+        conn.execute(insert(Booking), [
+            {"resource_id": rid, "start_utc": s + timedelta(hours=h), "end_utc": s + timedelta(hours=h + 1),
+             "name": "Nu", "phone": None}
+            for rid in range(1, 6) for h in range(4)
+        ])
+    print(f"seed: {n} historiske + 20 kommende bookinger på {time.perf_counter() - t0:.1f} s")
+
+
+def sizes() -> str:
+    engine = get_engine()
+    if engine.dialect.name != "postgresql":
+        return ""
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE bookings"))
+        t, i = conn.execute(text(
+            "SELECT pg_table_size('bookings'), pg_indexes_size('bookings')"
+        )).one()
+    return f"bookings: tabel {t / 2**20:.1f} MiB, indekser {i / 2**20:.1f} MiB"
+
+
+def run(label: str, day: date, reps: int) -> None:
+    def call(fn):
+        def inner():
+            with SessionLocal() as db:
+                return fn(db)
+        return inner
+    n = len(call(lambda db: app_main._bookings_json(db, day))())
+    report(f"{label}: bookings dag", measure(call(lambda db: app_main._bookings_json(db, day)), reps, warmup=3))
+    report(f"{label}: availability dag", measure(call(lambda db: app_main._availability_payload(db, day, True, 30)),
+                                                  reps, warmup=3))
+    print(f"{'':<40} ({n} bytes JSON)  {sizes()}")
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    reps = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    init_db()
+    day = upcoming_friday()
+    seed(n, day)
+    with SessionLocal() as db:
+        print("bookings:", db.execute(select(func.count(Booking.id))).scalar())
+
+    run("før arkiv", day, reps)
+    print("arkivering:", archive_old_bookings())
+    if get_engine().dialect.name == "postgresql":
+        with get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("VACUUM FULL bookings"))
+    run("efter arkiv", day, reps)
+
+
+if __name__ == "__main__":
+    main()
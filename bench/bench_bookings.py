@@ -0,0 +1,100 @@
+"""Serialisering af GET /api/bookings – ORM + BookingRead vs. kolonner + orjson.
+
+Seeder én dag med mange bookinger (default 10.000) direkte i tabellen og
+måler payload-bygningen uden HTTP og response-cache, så det kun er
+forespørgsel + serialisering der sammenlignes. Hukommelse er peak fra
+tracemalloc for ét kald.
+
+    python bench/bench_bookings.py [bookinger] [gentagelser]
+"""
+from __future__ import annotations
+
+import json
+import sys
+import tracemalloc
+from datetime import date, timedelta
+
+from _common import measure, report, setup_env
+
+setup_env("bookings")
+
+from sqlalchemy import and_, insert  # noqa: E402
+
+from app import main as app_main  # noqa: E402
+from app.db import SessionLocal, get_engine  # noqa: E402
+from app.core.tz import day_bounds, local_iso  # noqa: E402
+from app.models import Booking, init_db  # noqa: E402
+
+DAY = date(2026, 10, 23)
+
+
+def seed(n: int) -> None:
+    # Bordene deles om bookingerne; overlap er ligegyldigt for målingen
+    start, _ = day_bounds(DAY)
+    rows = [
+        {
+            "resource_id": 1 + i % 5,
+            "start_utc": start + timedelta(seconds=i * 8),
+            "end_utc": start + timedelta(seconds=i * 8 + 3600),
+            "name": f"Gæst {i}",
+            "phone": f"+45 {10000000 + i}",
+        }
+        for i in range(n)
+    ]
+    with get_engine().begin() as conn:
+        conn.execute(insert(Booking), rows)
+
+
+def legacy(db, d) -> bytes:
+    # Den tidligere implementering: fulde ORM-entiteter og en BookingRead pr. række
+    start_day, end_day = day_bounds(d)
+    q = db.query(Booking).filter(
+        app_main.BOOKING_START_COL.isnot(None), app_main.BOOKING_END_COL.isnot(None),
+        and_(app_main.BOOKING_START_COL >= start_day, app_main.BOOKING_START_COL < end_day),
+    )
+    out = []
+    for b in q.order_by(app_main.BOOKING_START_COL.asc()).all():
+        out.append(app_main.BookingRead(
+            id=b.id, resource_id=b.resource_id, name=b.name, phone=b.phone,
+            email=getattr(b, "email", None),
+            start_iso_local=local_iso(b.start_utc), end_iso_local=local_iso(b.end_utc),
+        ).model_dump())
+    return json.dumps(out, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def peak_kib(fn) -> float:
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    reps = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    init_db()
+    seed(n)
+
+    for label, fn in (("ORM + BookingRead + json", legacy), ("kolonner + yield_per + orjson", app_main._bookings_json)):
+        def call(fn=fn):
+            db = SessionLocal()
+            try:
+                return fn(db, DAY)
+            finally:
+                db.close()
+        assert json.loads(call()) == json.loads(legacy_call()), label
+        report(f"{label} ({n} rækker)", measure(call, reps, warmup=2))
+        print(f"{'':<40} peak {peak_kib(call):>10.0f} KiB")
+
+
+def legacy_call() -> bytes:
+    db = SessionLocal()
+    try:
+        return legacy(db, DAY)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Rendering af bekræftelsesmailen – renders/sek.
+
+    python bench/bench_email_render.py [antal]
+"""
+from __future__ import annotations
+
+import sys
+import time
+
+from _common import ROOT
+
+sys.path.insert(0, ROOT)
+
+from app.core import email as mail  # noqa: E402
+
+DATA = mail.BookingEmailData(
+    to="guest@example.com", name="Gæst <Hansen> & Co", booking_id="1234",
+    date="2030-01-04", start="19:00", end="21:00", table="Pool 1", people=4, phone="12345678",
+)
+
+
+def _rate(fn, n: int) -> float:
+    for _ in range(200):
+        fn(DATA)
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn(DATA)
+    return n / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    print(f"{'_build_html':<16} {_rate(mail._build_html, n):>12.0f} renders/s")
+    if hasattr(mail, "_build_text"):
+        print(f"{'_build_text':<16} {_rate(mail._build_text, n):>12.0f} renders/s")
+
+
+if __name__ == "__main__":
+    main()
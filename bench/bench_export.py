@@ -0,0 +1,79 @@
+"""Hukommelse og hastighed for /api/bookings/export over korte og lange perioder.
+
+Seeder N bookinger (default 500.000, 80 pr. aften) med bulk-INSERT, flytter
+den ældste del til bookings_archive og streamer så en dag, et år og hele
+perioden som NDJSON, CSV og CSV+gzip direkte fra export.stream(). Peak
+måles med tracemalloc – den skal være den samme uanset periodens længde.
+
+    python bench/bench_export.py [antal]
+    BENCH_DB_URL=postgresql+psycopg://... python bench/bench_export.py
+"""
+from __future__ import annotations
+
+import sys
+import time
+import tracemalloc
+from datetime import date, time as dtime, timedelta
+
+from _common import setup_env
+
+setup_env("export")
+
+from sqlalchemy import insert  # noqa: E402
+
+from app.core import export  # noqa: E402
+from app.core.archive import archive_old_bookings  # noqa: E402
+from app.core.catalog import catalog  # noqa: E402
+from app.core.tz import day_bounds, local_to_utc  # noqa: E402
+from app.db import SessionLocal, get_engine  # noqa: E402
+from app.models import Booking, init_db  # noqa: E402
+
+CHUNK = 50_000
+PER_DAY = 5 * 16   # 5 borde x halve timer 19:00-03:00
+
+
+def seed(n: int, first: date) -> None:
+    s0 = local_to_utc(first, dtime(19, 0))
+    t0 = time.perf_counter()
+    with get_engine().begin() as conn:
+        for off in range(0, n, CHUNK):
+            rows = []
+            for i in range(off, min(n, off + CHUNK)):
+                slot = i % PER_DAY
+                s = s0 + timedelta(days=i // PER_DAY, minutes=30 * (slot // 5))
+                rows.append({"resource_id": 1 + slot % 5, "start_utc": s, "end_utc": s + timedelta(minutes=30),
+                             "name": f"Gæst {i}", "phone": "12345678"})
+            conn.execute(insert(Booking), rows)
+    print(f"seed: {n} bookinger fra {first} på {time.perf_counter() - t0:.1f} s")
+
+
+def run(label: str, d0: date, d1: date, fmt: str, gz: bool = False) -> None:
+    with SessionLocal() as db:
+        res = {r["id"]: r for r in catalog.all(db)}
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    size = sum(len(chunk) for chunk in export.stream(day_bounds(d0)[0], day_bounds(d1)[1], fmt, res, None, gz))
+    dt = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:<10} {fmt + ('+gzip' if gz else ''):<10} {size / 2**20:8.1f} MiB  {dt:6.2f} s   "
+          f"peak {peak / 2**20:5.1f} MiB")
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    init_db()
+    days = n // PER_DAY
+    first = date.today() - timedelta(days=days - 30)
+    seed(n, first)
+    print("arkiveret:", archive_old_bookings())
+    last = first + timedelta(days=days - 1)
+    year = last - timedelta(days=364)
+    for fmt, gz in (("ndjson", False), ("csv", False), ("csv", True)):
+        run("1 dag", last, last, fmt, gz)
+        run("1 år", year, last, fmt, gz)
+        run("alt", first, last, fmt, gz)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Travl fredag: mange gæster om få ledige tider, med og uden hold.
+
+Hver gæst henter /api/availability, vælger en tilfældig ledig time, bruger
+--fill sekunder på at udfylde formularen og sender. Uden hold (direkte POST
+/api/bookings) opdager den der taber først at tiden er væk når formularen
+sendes, og må vælge igen og udfylde igen. Med hold sætter gæsten et hold på
+tiden før den udfylder; et 409 kommer da med det samme, og bekræftelsen
+fejler ikke. Vi tæller mislykkede afsendelser (en formular udfyldt forgæves).
+
+    python bench/bench_holds.py [--guests 40] [--fill 0.5] [--workers 2]
+    BENCH_DB_URL=postgresql+psycopg://... python bench/bench_holds.py
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+from collections import Counter
+
+import httpx
+
+from _common import setup_env, start_server
+
+PORT = int(os.getenv("BENCH_PORT", "8798"))
+DAYS = {False: "2030-01-04", True: "2030-01-11"}   # hver sin fredag: samme database
+
+
+def free_slots(avail: dict) -> list:
+    return [(int(rid), s["label"]) for rid, slots in avail["resources"].items() for s in slots if s["free"]]
+
+
+async def guest(c: httpx.AsyncClient, day: str, fill: float, use_holds: bool, stats: Counter, waits: list) -> None:
+    t0 = time.perf_counter()
+    for _ in range(10):
+        slots = free_slots((await c.get("/api/availability", params={"date": day})).json())
+        if not slots:
+            stats["udsolgt"] += 1
+            return
+        rid, label = random.choice(slots)
+        slot = {"resource_id": rid, "date": day, "start_time": label, "duration": 60}
+        if use_holds:
+            r = await c.post("/api/holds", json=slot)
+            if r.status_code == 409:
+                stats["hold afvist (før udfyldning)"] += 1
+                continue
+            r.raise_for_status()
+            await asyncio.sleep(fill)
+            r = await c.post(f"/api/holds/{r.json()['id']}/confirm", json={"name": "Gæst"})
+        else:
+            await asyncio.sleep(fill)
+            r = await c.post("/api/bookings", json={**slot, "name": "Gæst"})
+        if r.status_code == 201:
+            stats["booket"] += 1
+            waits.append(time.perf_counter() - t0)
+            return
+        assert r.status_code in (409, 410), r.text
+        stats["afsendelse fejlede (formular spildt)"] += 1
+    stats["opgav"] += 1
+
+
+def run(use_holds: bool, guests: int, fill: float, workers: int) -> None:
+    day = DAYS[use_holds]
+    proc = start_server(PORT, workers=workers)
+    try:
+        async def main():
+            stats, waits = Counter(), []
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=60) as c:
+                await asyncio.gather(*(guest(c, day, fill, use_holds, stats, waits) for _ in range(guests)))
+            return stats, waits
+        stats, waits = asyncio.run(main())
+    finally:
+        proc.terminate()
+        proc.wait()
+    print(f"{'med hold ' if use_holds else 'uden hold'}: {dict(stats)}"
+          f"   tid til booking p50 {statistics.median(waits):.2f} s  max {max(waits):.2f} s")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--guests", type=int, default=40)
+    ap.add_argument("--fill", type=float, default=0.5, help="sekunder gæsten bruger på formularen")
+    ap.add_argument("--workers", type=int, default=2)
+    args = ap.parse_args()
+    setup_env("holds")
+    random.seed(7)
+    # fredag 19-23 á en time: 5 borde x 4 = 20 tider
+    for use_holds in (False, True):
+        run(use_holds, args.guests, args.fill, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Bekræftelsesmails mod en lokal aiosmtpd-server.
+
+Sammenligner én forbindelse pr. mail (den gamle vej) med MailDispatcher,
+der genbruger forbindelsen og sender i batches.
+
+    pip install aiosmtpd
+    python bench/bench_mail.py [antal]
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import io
+import logging
+import os
+import sys
+import time
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+from _common import ROOT
+
+sys.path.insert(0, ROOT)
+logging.getLogger("mail.log").setLevel(logging.ERROR)  # aiosmtpd-støj om login_data
+
+PORT = int(os.getenv("BENCH_SMTP_PORT", "8025"))
+os.environ.update({
+    "SMTP_HOST": "127.0.0.1",
+    "SMTP_PORT": str(PORT),
+    "SMTP_USER": "bench",
+    "SMTP_PASS": "bench",
+    "SMTP_TLS": "false",
+    "EMAIL_FROM": "booking@example.com",
+})
+
+from app.core.email import BookingEmailData, MailDispatcher, _send_async  # noqa: E402
+
+
+class Sink:
+    def __init__(self) -> None:
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+def _data(i: int) -> BookingEmailData:
+    return BookingEmailData(
+        to=f"guest{i}@example.com", name=f"Gæst {i}", booking_id=str(i),
+        date="2030-01-04", start="19:00", end="20:00", table="Pool 1", phone="12345678",
+    )
+
+
+async def _legacy(n: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        await _send_async(_data(i))
+    return time.perf_counter() - t0
+
+
+async def _dispatcher(n: int) -> tuple[float, dict]:
+    d = MailDispatcher()
+    await d.start()
+    t0 = time.perf_counter()
+    for i in range(n):
+        d.submit(_data(i))
+    await d._queue.join()
+    elapsed = time.perf_counter() - t0
+    stats = d.stats()
+    await d.stop()
+    return elapsed, stats
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    sink = Sink()
+    ctl = Controller(
+        sink, hostname="127.0.0.1", port=PORT,
+        auth_require_tls=False, authenticator=lambda *a: AuthResult(success=True),
+    )
+    ctl.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            legacy = asyncio.run(_legacy(n))
+        pooled, stats = asyncio.run(_dispatcher(n))
+    finally:
+        ctl.stop()
+    print(f"{'én forbindelse pr. mail':<28} {n / legacy:>8.1f} mails/s")
+    print(f"{'MailDispatcher':<28} {n / pooled:>8.1f} mails/s   forbindelser={stats['connects']}"
+          f"   p50={stats['latency_ms_p50']} ms   modtaget i alt={sink.received}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Viral weekend: mange samtidige, ens læsninger + rate limiting pr. IP.
+
+Del 1 starter uvicorn med og uden SINGLE_FLIGHT. I hver runde oprettes én
+booking (ny datoversion, så cachen er kold), og derefter sender `clients`
+klienter samme GET /api/availability på én gang. Vi tæller
+DB-forespørgsler via /api/metrics og måler latens.
+
+Del 2 starter med en lav grænse og sender en byge fra to klient-IP'er via
+X-Forwarded-For (forbindelsen kommer fra 127.0.0.1, en betroet proxy – som
+Caddy) og viser 200/429 pr. IP og Retry-After.
+
+    python bench/bench_public.py [--clients 100] [--rounds 10]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import time
+from collections import Counter
+
+import httpx
+
+from _common import setup_env, start_server
+
+PORT = int(os.getenv("BENCH_PORT", "8797"))
+DAYS = {False: "2030-01-04", True: "2030-01-11"}   # hver sin dag: samme database
+
+
+def db_queries(c: httpx.Client) -> int:
+    m = re.search(r"^db_queries_total (\d+)", c.get("/api/metrics").text, re.M)
+    return int(m.group(1))
+
+
+async def burst(day: str, clients: int) -> list:
+    lat = []
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=60,
+                                 limits=httpx.Limits(max_connections=clients)) as c:
+        async def one():
+            t0 = time.perf_counter()
+            r = await c.get("/api/availability", params={"date": day, "staff": True, "step": 30})
+            r.raise_for_status()
+            lat.append((time.perf_counter() - t0) * 1000)
+        await asyncio.gather(*(one() for _ in range(clients)))
+    return lat
+
+
+def coalescing(enabled: bool, clients: int, rounds: int) -> None:
+    day = DAYS[enabled]
+    proc = start_server(PORT, {"SINGLE_FLIGHT": "1" if enabled else "0"})
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{PORT}") as c:
+            lat, queries = [], 0
+            for i in range(rounds):
+                r = c.post("/api/bookings", json={"resource_id": 1 + i % 5, "date": day, "duration": 30,
+                                              "start_time": f"{19 + i // 10}:{30 * (i // 5 % 2):02d}",
+                                              "name": "Viral", "is_staff": True})
+                assert r.status_code == 201, r.text
+                before = db_queries(c)
+                lat += asyncio.run(burst(day, clients))
+                queries += db_queries(c) - before
+            stats = c.get("/api/cache/stats").json()["single_flight"]
+        lat.sort()
+        print(f"single-flight {'til' if enabled else 'fra'}: {queries / rounds:6.1f} DB-forespørgsler pr. "
+              f"{clients} ens GET   p50 {statistics.median(lat):7.1f} ms   p99 {lat[int(len(lat) * .99)]:7.1f} ms"
+              f"   delt {stats['shared']}")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def rate_limit(n: int) -> None:
+    proc = start_server(PORT, {"RATE_LIMIT_RPS": "5", "RATE_LIMIT_BURST": "10"})
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{PORT}") as c:
+            for ip in ("203.0.113.7", "198.51.100.23"):
+                codes, retry = Counter(), set()
+                for _ in range(n):
+                    # en klient der forfalsker headeret ender til venstre for Caddys adresse
+                    r = c.get("/api/resources", headers={"X-Forwarded-For": f"10.9.9.9, {ip}"})
+                    codes[r.status_code] += 1
+                    if r.status_code == 429:
+                        retry.add(r.headers.get("Retry-After"))
+                print(f"rate limit {ip:<15} {dict(codes)}  Retry-After {sorted(retry)}")
+            print("health under grænsen:", c.get("/api/health").status_code)
+            print(re.findall(r"^rate_limit_total.*$", c.get("/api/metrics").text, re.M))
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", type=int, default=100)
+    ap.add_argument("--rounds", type=int, default=10)
+    args = ap.parse_args()
+    if args.rounds > 40:
+        ap.error("højst 40 runder (5 borde x 19:00-23:00 i halve timer)")
+    setup_env("public")
+    for enabled in (False, True):
+        coalescing(enabled, args.clients, args.rounds)
+    rate_limit(30)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Belægningsrapport fra occupancy_hourly mod en scanning af bookings.
+
+Seeder N bookinger (default 200.000; 80 pr. aften = fuldt hus, ~7 år) med
+bulk-INSERT, genopbygger rollup-tabellen med backfill og måler så "fredage
+sidste kvartal" to gange: /api/reports/occupancy (læser kun rollups) og den samme
+sum beregnet direkte fra bookings, som man ellers ville gøre.
+
+    python bench/bench_reports.py [antal] [gentagelser]
+    BENCH_DB_URL=postgresql+psycopg://... python bench/bench_reports.py
+"""
+from __future__ import annotations
+
+import sys
+import time
+from datetime import date, time as dtime, timedelta
+
+from _common import measure, report, setup_env
+
+setup_env("reports")
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app import main as app_main  # noqa: E402
+from app.core import rollup  # noqa: E402
+from app.core.tz import local_to_utc, to_local  # noqa: E402
+from app.db import SessionLocal, get_engine  # noqa: E402
+from app.models import Booking, init_db  # noqa: E402
+
+CHUNK = 50_000
+FIRST = date(2024, 1, 1)
+PER_DAY = 5 * 16   # 5 borde x halve timer 19:00-03:00
+
+
+def seed(n: int) -> None:
+    first = local_to_utc(FIRST, dtime(19, 0))
+    t0 = time.perf_counter()
+    with get_engine().begin() as conn:
+        for off in range(0, n, CHUNK):
+            rows = []
+            for i in range(off, min(n, off + CHUNK)):
+                slot = i % PER_DAY
+                s = first + timedelta(days=i // PER_DAY, minutes=30 * (slot // 5))
+                rows.append({"resource_id": 1 + slot % 5, "start_utc": s, "end_utc": s + timedelta(minutes=30),
+                             "name": f"Gæst {i}", "phone": None})
+            conn.execute(insert(Booking), rows)
+    print(f"seed: {n} bookinger på {time.perf_counter() - t0:.1f} s")
+
+
+def raw_fridays(db, d0: date, d1: date) -> int:
+    # samme spørgsmål uden rollups: alle bookinger i perioden, fredag = staff-dagen
+    open_dt, _ = app_main._day_window(d0, True)
+    _, close_dt = app_main._day_window(d1, True)
+    shift = timedelta(hours=app_main.STAFF_CLOSE_HOUR)
+    busy = 0
+    for s, e in db.execute(select(Booking.start_utc, Booking.end_utc)
+                           .where(Booking.start_utc >= open_dt, Booking.start_utc < close_dt)):
+        for h, minutes in rollup.split_hours(s, e):
+            local = to_local(h)
+            # kun åbningsvinduet 19-04, som rapporten
+            in_window = local.hour >= app_main.ALLOWED_START_HOUR or local.hour < app_main.STAFF_CLOSE_HOUR
+            if in_window and (local - shift).weekday() == 4:
+                busy += minutes
+    return round(busy)
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    reps = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    init_db()
+    seed(n)
+    print("backfill:", rollup.backfill())
+
+    d0, d1 = date(2029, 10, 1), date(2029, 12, 31)
+    with SessionLocal() as db:
+        rep = app_main._occupancy_payload(db, d0, d1, "weekday", None)
+        fri = next(r for r in rep["rows"] if r["label"] == "fredag")
+        print(f"fredage {d0}..{d1}: rollup {fri['busy_minutes']} min ({fri['occupancy_pct']} %), "
+              f"scanning {raw_fridays(db, d0, d1)} min")
+
+        report("rapport fra occupancy_hourly",
+               measure(lambda: app_main._occupancy_payload(db, d0, d1, "weekday", None), reps, warmup=2))
+        report("samme sum fra bookings", measure(lambda: raw_fridays(db, d0, d1), reps, warmup=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""GET /api/resources – requests/sec.
+
+    python bench/bench_resources.py [antal]
+"""
+from __future__ import annotations
+
+import sys
+
+from _common import measure, report, setup_env
+
+setup_env("resources")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with TestClient(app) as client:
+        def call():
+            r = client.get("/api/resources")
+            assert r.status_code == 200, r.text
+        report("GET /api/resources", measure(call, n))
+
+
+if __name__ == "__main__":
+    main()
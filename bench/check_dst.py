@@ -0,0 +1,100 @@
+"""Tjek af tidszonehåndtering omkring sommertidsskiftet (Europe/Copenhagen).
+
+Kører appen in-process mod en frisk database og gennemgår de to weekender i
+2026 hvor uret stilles: natten til søndag 29/3 (02:00 -> 03:00) og natten til
+søndag 25/10 (03:00 -> 02:00). Tjekker varigheder, dagslister, slots og at
+et klokkeslæt der ikke findes afvises. Exit-kode 1 ved fejl.
+
+    python bench/check_dst.py
+    BENCH_DB_URL=postgresql+psycopg://... python bench/check_dst.py
+"""
+from __future__ import annotations
+
+import os
+import sys
+from datetime import datetime
+
+from _common import setup_env
+
+setup_env("dst")
+os.environ.setdefault("ARCHIVE_INTERVAL", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+failures = []
+
+
+def check(label: str, got, want) -> None:
+    ok = got == want
+    print(f"{'ok  ' if ok else 'FEJL'} {label}: {got!r}" + ("" if ok else f" (forventet {want!r})"))
+    if not ok:
+        failures.append(label)
+
+
+def minutes(b) -> int:
+    s, e = datetime.fromisoformat(b["start_iso_local"]), datetime.fromisoformat(b["end_iso_local"])
+    return int((e - s).total_seconds() // 60)
+
+
+def main() -> None:
+    with TestClient(app) as c:
+        def book(day, start, dur, rid=1, staff=True):
+            return c.post("/api/bookings", json={
+                "resource_id": rid, "date": day, "start_time": start, "duration": dur,
+                "name": "DST", "is_staff": staff,
+            })
+
+        def ids(day):
+            return sorted(b["id"] for b in c.get("/api/bookings", params={"date": day}).json())
+
+        def slots(day, rid=1):
+            r = c.get("/api/availability", params={"date": day, "staff": True}).json()
+            return r["resources"][str(rid)]
+
+        # --- forår: 29/3 02:00-03:00 findes ikke ---
+        r = book("2026-03-29", "01:30", 60)
+        check("forår: 01:30 + 60 min oprettet", r.status_code, 201)
+        spring = r.json()
+        check("forår: slut", spring["end_iso_local"], "2026-03-29T03:30:00+02:00")
+        check("forår: varighed", minutes(spring), 60)
+        check("forår: 02:30 findes ikke", book("2026-03-29", "02:30", 60, rid=2).status_code, 422)
+        check("forår: på dagslisten 29/3", ids("2026-03-29"), [spring["id"]])
+        check("forår: ikke på dagslisten 28/3", ids("2026-03-28"), [])
+        grid = slots("2026-03-28")
+        check("forår: staff-slots lørdag (19-04, uden 02)", [s["label"] for s in grid],
+              ["19:00", "20:00", "21:00", "22:00", "23:00", "00:00", "01:00", "03:00"])
+        check("forår: optaget 01:00 og 03:00", [s["busy_minutes"] for s in grid][-2:], [30, 30])
+        check("forår: overlap over skiftet afvises", book("2026-03-29", "01:00", 60).status_code, 409)
+
+        # --- efterår: 25/10 02:00-03:00 findes to gange ---
+        r = book("2026-10-25", "01:30", 120)
+        check("efterår: 01:30 + 120 min oprettet", r.status_code, 201)
+        fall = r.json()
+        check("efterår: slut (vægur kun +1 t)", fall["end_iso_local"], "2026-10-25T02:30:00+01:00")
+        check("efterår: varighed", minutes(fall), 120)
+        check("efterår: på dagslisten 25/10", ids("2026-10-25"), [fall["id"]])
+        grid = slots("2026-10-24")
+        check("efterår: staff-slots lørdag (19-04, 02 to gange)", [s["label"] for s in grid],
+              ["19:00", "20:00", "21:00", "22:00", "23:00", "00:00", "01:00", "02:00", "02:00", "03:00"])
+        check("efterår: optaget 01:00-02:00-02:00", [s["busy_minutes"] for s in grid][6:9], [30, 60, 30])
+
+        # --- offentlig side og kanten af dagen ---
+        r = book("2026-10-24", "19:00", 60, rid=3, staff=False)
+        check("offentlig lørdag 19:00", (r.status_code, r.json().get("start_iso_local")),
+              (201, "2026-10-24T19:00:00+02:00"))
+        check("offentlig 22:30 + 60 afvises", book("2026-10-23", "22:30", 60, rid=3, staff=False).status_code, 403)
+        r = book("2026-10-24", "23:30", 60, rid=4)
+        check("staff 23:30 lørdag hører til 24/10", r.json()["id"] in ids("2026-10-24"), True)
+        rng = c.get("/api/availability/range",
+                    params={"from": "2026-10-23", "to": "2026-10-25", "staff": True}).json()
+        check("periode: slots pr. dag", [len(d["slots"]) for d in rng["days"].values()], [9, 10, 9])
+        check("periode: åbning med offset", rng["days"]["2026-10-24"]["open_local"], "2026-10-24T19:00:00+02:00")
+
+    print(f"\n{len(failures)} fejl" if failures else "\nalt ok")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Samtidige POST /api/bookings mod ét og samme slot.
+
+Præcis én booking må lykkes; resten skal få 409. Mod Postgres med
+ex_booking_no_overlap holder det under last – mod SQLite bruges fallback-
+tjekket, som ikke er race-frit.
+
+    python bench/stress_overlap.py [antal] [--url http://localhost:8000]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from _common import setup_env
+
+# Tilfældig fredag, så gentagne kørsler mod samme database ikke kolliderer
+_FRIDAY = date(2030, 1, 4) + timedelta(weeks=random.randrange(5000))
+
+PAYLOAD = {
+    "resource_id": 1,
+    "date": _FRIDAY.isoformat(),
+    "start_time": "20:00",
+    "duration": 60,
+    "name": "Stress",
+    "is_staff": True,
+}
+
+
+def _post_http(base: str, body: dict) -> int:
+    req = urllib.request.Request(
+        base.rstrip("/") + "/api/bookings",
+        data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=30) as r:
+            return r.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("n", nargs="?", type=int, default=50)
+    ap.add_argument("--url", help="kør mod en kørende server i stedet for in-process")
+    args = ap.parse_args()
+
+    if args.url:
+        run(lambda: _post_http(args.url, PAYLOAD), args.n)
+        return
+
+    setup_env("stress")
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        run(lambda: client.post("/api/bookings", json=PAYLOAD).status_code, args.n)
+
+
+def run(post, n: int) -> None:
+    with ThreadPoolExecutor(max_workers=n) as ex:
+        codes = Counter(ex.map(lambda _: post(), range(n)))
+    print(f"{n} samtidige POST: " + ", ".join(f"{k}={v}" for k, v in sorted(codes.items())))
+    if codes.get(201, 0) != 1:
+        print("FEJL: forventede præcis én 201")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-/* end-alert.js v3 — blink + Færdig / +1 time */
+/* end-alert.js v4 — blink + Færdig / +1 time, sluttider fra /api/timeline */
 (() => {
   const ALERT_MINUTES = Number(window.ALERT_MINUTES ?? 5);
   const ALERT_MS = ALERT_MINUTES * 60 * 1000;
@@ -72,14 +72,19 @@
   }
 
   async function extendBooking(id, minutes=60){
-    try{
-      const res = await fetch(`/api/bookings/${id}`, {
-        method: 'PUT',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ add_minutes: minutes })
-      });
-      if (res.ok) return true;
-    }catch{}
+    // Én nøgle for begge forsøg: nåede det første frem, forlænges der ikke to gange
+    const key = (crypto.randomUUID ? crypto.randomUUID() : Date.now() + '-' + Math.random().toString(16).slice(2));
+    for (let attempt = 0; attempt < 2; attempt++){
+      try{
+        const res = await fetch(`/api/bookings/${id}`, {
+          method: 'PUT',
+          headers: { 'Content-Type': 'application/json', 'Idempotency-Key': key },
+          body: JSON.stringify({ add_minutes: minutes })
+        });
+        if (res.ok) return true;
+        break;
+      }catch{}
+    }
     // fallback-endpoint hvis du hellere vil have en separat extend-route
     try{
       const res2 = await fetch(`/api/bookings/extend`, {
@@ -150,7 +155,33 @@ bar.querySelector('.btn-extend30').addEventListener('click', async (e)=>{
     }
   }
 
-  function scan(){
+  // Præcise sluttider fra /api/timeline (staff.html sender datoen med i
+  // 'bookings-rendered'); at læse tiden ud af kortets tekst er kun fallback
+  let timelineDate = null;
+  async function scanTimeline(){
+    if (!timelineDate) return false;
+    try{
+      const res = await fetch(`/api/timeline?date=${encodeURIComponent(timelineDate)}`);
+      if (!res.ok) return false;
+      const tl = await res.json();
+      for (const r of tl.resources){
+        const n = r.next_end;
+        if (!n) continue;
+        const btn = document.querySelector(`button[data-del="${n.booking_id}"]`);
+        const card = btn && findCardFromButton(btn);
+        if (!card || card.dataset.ack === '1') continue;
+        scheduleCard(card, new Date(n.end_local));
+      }
+      return true;
+    }catch{ return false; }
+  }
+
+  async function scan(){
+    if (await scanTimeline()) return;
+    scanDom();
+  }
+
+  function scanDom(){
     document.querySelectorAll('button[data-del]').forEach(btn=>{
       const card = findCardFromButton(btn);
       if (!card) return;
@@ -167,5 +198,10 @@ bar.querySelector('.btn-extend30').addEventListener('click', async (e)=>{
   } else {
     scan();
   }
-  setInterval(scan, 15000);
+  // staff.html sender 'bookings-rendered' efter hver gentegning (også ved live-events)
+  window.addEventListener('bookings-rendered', (e)=>{
+    timelineDate = e.detail?.date || timelineDate;
+    scan();
+  });
+  setInterval(scan, 60000);
 })();